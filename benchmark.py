@@ -0,0 +1,262 @@
+import os
+import sys
+import gc
+import copy
+import json
+import math
+import time
+import platform
+import argparse
+import contextlib
+
+# the scene benchmarks render offscreen (see headless.py), and PyOpenGL picks its platform
+#   when it is first imported, so this has to come before anything imports it
+os.environ.setdefault('PYOPENGL_PLATFORM', 'egl')
+os.environ.setdefault('EGL_PLATFORM', 'surfaceless')
+
+import numpy as np
+import light
+import gl_state
+from camera import Camera
+from utils import Point
+from light import Light
+from cube import Cube
+from cylinder import Cylinder
+from rendered_object import RenderedObject
+from culling import frustum_planes, boxes_in_frustum
+from bvh import BoundingVolumeHierarchy, SceneBVH, ray_box_distances
+
+# benchmarks for the hot paths of the renderer, from single calls up to whole scenes
+#   usage: python benchmark.py [--suites micro mesh bvh scene] [--output results.json]
+#          [--baseline benchmark_baseline.json] [--save-baseline]
+# every result is the time of one call (or one frame) in milliseconds, and is compared against
+#   the baseline file if there is one, failing with a non-zero exit code if any got slower
+#   by more than the tolerance
+# baselines are only meaningful on the machine they were recorded on, so each machine keeps its own
+
+suites = ('micro', 'mesh', 'bvh', 'scene')
+
+# per-call time of a function in milliseconds, as the median and minimum over several repeats
+#   each repeat calls it number times, so very short calls still take a measurable amount of time
+def time_calls(function, number=1, repeats=5):
+    times = []
+    for _ in range(repeats):
+        start_time = time.perf_counter_ns()
+        for _ in range(number):
+            function()
+        times.append((time.perf_counter_ns() - start_time) / number / 1e6)
+    return {'median_ms': float(np.median(times)), 'min_ms': float(min(times))}
+
+def record(results, name, result):
+    results[name] = result
+    print(f'{name:<44} {result["median_ms"]:12.4f} ms   (min {result["min_ms"]:.4f} ms)')
+
+# replaces every OpenGL function the modules call with one that does nothing, so their
+#   Python side can be timed without a context (each module imports them with from OpenGL.GL import *)
+def stub_gl_call(*arguments):
+    return 1
+
+@contextlib.contextmanager
+def stub_gl(*modules):
+    replaced = []
+    for module in modules:
+        for name in dir(module):
+            if name.startswith('gl') and callable(getattr(module, name)):
+                replaced.append((module, name, getattr(module, name)))
+                setattr(module, name, stub_gl_call)
+    try:
+        yield
+    finally:
+        for module, name, function in replaced:
+            setattr(module, name, function)
+        # whatever the stubs bound was never really bound, so none of it can stay cached
+        #   (a fake buffer id would otherwise match a real one, and skip its bind)
+        gl_state.GLState.reset()
+
+# the lights are class state, so it is put back afterwards for the benchmarks that follow
+@contextlib.contextmanager
+def saved_lights():
+    fields = ('all_lights', 'buffer_data', 'ubo', 'dirty_start', 'dirty_end', 'positions_dirty', 'camera_version', 'defines')
+    saved = {field: copy.copy(getattr(Light, field)) for field in fields}
+    try:
+        yield
+    finally:
+        for field, value in saved.items():
+            setattr(Light, field, value)
+
+def micro_benchmarks(results):
+    rendered_object = RenderedObject()
+    record(results, 'RenderedObject.translate', time_calls(lambda: rendered_object.translate(0.1, 0.0, 0.0), number=10000))
+    record(results, 'RenderedObject.scale', time_calls(lambda: rendered_object.scale(1.0, 1.0, 1.0), number=10000))
+    record(results, 'RenderedObject.rotate_around_x', time_calls(lambda: rendered_object.rotate_around_x(1.0), number=10000))
+    record(results, 'RenderedObject.rotate_around_y', time_calls(lambda: rendered_object.rotate_around_y(1.0), number=10000))
+    record(results, 'RenderedObject.rotate_around_z', time_calls(lambda: rendered_object.rotate_around_z(1.0), number=10000))
+
+    camera = Camera(60.0, 1.0, eye=Point(0.0, 0.0, 8.0))
+    record(results, 'Camera.update_view_matrix', time_calls(camera.update_view_matrix, number=10000))
+    record(results, 'Camera.set_projection', time_calls(camera.set_projection, number=10000))
+
+    # the uniform buffer upload is stubbed out, leaving the packing and eye-space transforms
+    with saved_lights(), stub_gl(light, gl_state):
+        Light.all_lights = []
+        for index in range(Light.max_lights):
+            Light(index, position=(index, 1.0, 2.0), is_local=index % 2 == 0)
+        Light.update_all(camera)
+
+        def update_moving_camera():
+            camera.rotate_yaw(1)
+            Light.update_all(camera)
+
+        record(results, 'Light.update_all (camera moving)', time_calls(update_moving_camera, number=1000))
+        record(results, 'Light.update_all (nothing changed)', time_calls(lambda: Light.update_all(camera), number=10000))
+
+def mesh_benchmarks(results):
+    for slices, stacks in ((8, 1), (32, 8), (128, 32), (512, 128)):
+        number = max(1, 20000 // (slices * stacks))
+        record(results, f'Cylinder.generate_mesh({slices}, {stacks})', time_calls(lambda: Cylinder.generate_mesh(slices, stacks), number=number))
+
+# boxes spread out so their density stays the same as their number grows, like a world that
+#   gets bigger rather than more crowded, so the camera sees about as many of them at every size
+#   (while brute force has to test more and more of them)
+def random_boxes(count, rng):
+    half_width = 10 * (count / 1000) ** (1 / 3)
+    centers = rng.uniform(-half_width, half_width, (count, 3))
+    extents = rng.uniform(0.1, 0.5, (count, 3))
+    return centers - extents, centers + extents
+
+def brute_force_ray_cast(origin, direction, mins, maxs):
+    near, far = ray_box_distances(origin, 1.0 / np.where(direction == 0.0, 1e-30, direction), mins, maxs)
+    hits = np.flatnonzero(near <= far)
+    return hits[np.argmin(near[hits])] if len(hits) else None
+
+# the bounding volume hierarchy against testing every box
+def bvh_benchmarks(results, counts):
+    rng = np.random.default_rng(0)
+    for count in counts:
+        mins, maxs = random_boxes(count, rng)
+        centers = (mins + maxs) / 2
+        extents = (maxs - mins) / 2
+
+        camera = Camera(45, 1, 0.1, 30, Point(0, 0, 0), yaw_angle=30, pitch_angle=10)
+        planes = frustum_planes(camera.view_projection_matrix)
+        origin = np.zeros(3)
+        direction = camera.look_direction
+
+        record(results, f'bvh build x{count}', time_calls(lambda: BoundingVolumeHierarchy(mins, maxs), repeats=3))
+        hierarchy = BoundingVolumeHierarchy(mins, maxs)
+
+        # one percent of the boxes move a little, like animated objects do between frames
+        moved = rng.choice(count, size=max(1, count // 100), replace=False)
+        offsets = rng.normal(0, 0.05, (len(moved), 3))
+        record(results, f'bvh refit 1% x{count}', time_calls(lambda: hierarchy.move(moved, mins[moved] + offsets, maxs[moved] + offsets)))
+        hierarchy.move(moved, mins[moved], maxs[moved])
+
+        assert np.array_equal(hierarchy.query_frustum(planes), np.flatnonzero(boxes_in_frustum(planes, centers, extents)))
+        assert hierarchy.ray_cast(origin, direction)[0] == brute_force_ray_cast(origin, direction, mins, maxs)
+
+        record(results, f'frustum brute force x{count}', time_calls(lambda: boxes_in_frustum(planes, centers, extents)))
+        record(results, f'frustum bvh x{count}', time_calls(lambda: hierarchy.query_frustum(planes)))
+        record(results, f'ray brute force x{count}', time_calls(lambda: brute_force_ray_cast(origin, direction, mins, maxs)))
+        record(results, f'ray bvh x{count}', time_calls(lambda: hierarchy.ray_cast(origin, direction)))
+
+# whole frames of main.py's scene with extra objects added, rendered offscreen
+#   the objects are laid out in a square grid, far enough away that all of them are in view
+def scene_benchmarks(results, counts, kinds, frames, width, height):
+    import main
+    from OpenGL.GL import glFinish
+
+    main.window_dimensions = (width, height)
+    main.init(headless=True)
+    main.camera = Camera(main.camera_angle, width / height)
+    main.camera.eye = copy.deepcopy(main.camera_start_position)
+
+    spacing = 3.0
+    for kind in kinds:
+        for count in counts:
+            side = math.ceil(math.sqrt(count))
+            distance = side * spacing / (2 * math.tan(math.radians(main.camera_angle / 2))) + spacing
+            group = main.scene.add(name=f'benchmark {kind}')
+            group.rendered_object.translate(-(side - 1) * spacing / 2, -(side - 1) * spacing / 2, main.camera_start_position.z - distance)
+            for index in range(count):
+                rendered_object = Cube() if kind == 'cube' else Cylinder(16, 4)
+                rendered_object.translate(index % side * spacing, index // side * spacing, 0.0)
+                main.scene.add(rendered_object, parent=group)
+            main.scene_bvh = SceneBVH(main.scene.rendered_objects())
+
+            def frame():
+                main.advance()
+                main.display()
+                glFinish()
+
+            # the first frame uploads everything, so it is left out
+            frame()
+            result = time_calls(frame, repeats=frames)
+            result['visible'] = main.culler.visible_count
+            result['triangles_saved'] = main.level_of_detail.full_triangles - main.level_of_detail.drawn_triangles
+            record(results, f'scene {kind} x{count}', result)
+
+            main.scene.remove(group)
+            del group, rendered_object
+            gc.collect()
+    main.scene_bvh = SceneBVH(main.scene.rendered_objects())
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    print(f'\ncompared with the baseline (tolerance {tolerance:.0%}):')
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result['median_ms'] / baseline[name]['median_ms']
+        regressed = ratio > 1 + tolerance
+        if regressed:
+            regressions.append(name)
+        print(f'{name:<44} {ratio:8.2f}x{"   REGRESSION" if regressed else ""}')
+    return regressions
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='benchmarks for the renderer')
+    parser.add_argument('--suites', nargs='+', choices=suites, default=list(suites))
+    parser.add_argument('--bvh-counts', nargs='+', type=int, default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--scene-counts', nargs='+', type=int, default=[10, 100, 1_000, 10_000, 100_000])
+    parser.add_argument('--scene-kinds', nargs='+', choices=('cube', 'cylinder'), default=['cube', 'cylinder'])
+    parser.add_argument('--frames', type=int, default=10, help='frames timed for each scene')
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=640)
+    parser.add_argument('--output', default='benchmark_results.json', help='file to write the results to, as JSON')
+    parser.add_argument('--baseline', default='benchmark_baseline.json', help='results to compare against, if the file exists')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='how much slower than the baseline counts as a regression')
+    return parser.parse_args()
+
+def main():
+    arguments = parse_arguments()
+    results = {}
+    if 'micro' in arguments.suites:
+        micro_benchmarks(results)
+    if 'mesh' in arguments.suites:
+        mesh_benchmarks(results)
+    if 'bvh' in arguments.suites:
+        bvh_benchmarks(results, arguments.bvh_counts)
+    if 'scene' in arguments.suites:
+        scene_benchmarks(results, arguments.scene_counts, arguments.scene_kinds, arguments.frames, arguments.width, arguments.height)
+
+    report = {
+        'machine': {'platform': platform.platform(), 'python': platform.python_version(), 'processor': platform.processor()},
+        'results': results,
+    }
+    with open(arguments.output, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    regressions = []
+    if arguments.save_baseline:
+        with open(arguments.baseline, 'w') as file:
+            json.dump(report, file, indent=2)
+    elif os.path.exists(arguments.baseline):
+        with open(arguments.baseline, 'r') as file:
+            regressions = compare(results, json.load(file)['results'], arguments.tolerance)
+        if regressions:
+            print(f'{len(regressions)} benchmarks regressed')
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,223 @@
+import numpy as np
+from culling import frustum_planes, boxes_in_frustum, world_bounds
+from transform_store import TransformStore
+
+# spreads the lowest 10 bits of each value out, leaving two zero bits between each of them
+def spread_bits(values):
+    values = values.astype('uint32') & np.uint32(0x3FF)
+    values = (values | (values << np.uint32(16))) & np.uint32(0x030000FF)
+    values = (values | (values << np.uint32(8))) & np.uint32(0x0300F00F)
+    values = (values | (values << np.uint32(4))) & np.uint32(0x030C30C3)
+    values = (values | (values << np.uint32(2))) & np.uint32(0x09249249)
+    return values
+
+# 30-bit morton codes of any number of points
+#   sorting by these orders the points along a curve that keeps nearby points close together
+def morton_codes(points):
+    low = points.min(axis=0)
+    size = np.maximum(points.max(axis=0) - low, 1e-12)
+    cells = ((points - low) / size * 1023).astype('uint32')
+    return (spread_bits(cells[:, 0]) << np.uint32(2)) | (spread_bits(cells[:, 1]) << np.uint32(1)) | spread_bits(cells[:, 2])
+
+# every index in each of the ranges [start, end), one range after another
+def expand_ranges(starts, ends):
+    lengths = ends - starts
+    offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    return np.arange(lengths.sum()) + offsets
+
+# distances along a ray to where it enters and leaves each box
+#   the ray misses a box when it would leave before it enters
+def ray_box_distances(origin, inverse_direction, mins, maxs):
+    entries = (mins - origin) * inverse_direction
+    exits = (maxs - origin) * inverse_direction
+    near = np.maximum(np.minimum(entries, exits).max(axis=1), 0.0)
+    far = np.maximum(entries, exits).min(axis=1)
+    return near, far
+
+class BoundingVolumeHierarchy:
+    # a binary tree of boxes over a set of boxes, for finding the ones in a frustum or along a ray
+    #   without testing each of them
+    # the boxes are sorted along a morton curve and cut into leaves of leaf_size neighbours,
+    #   then neighbouring nodes are paired up one level at a time until only the root is left
+    # node i of a level has nodes 2i and 2i + 1 of the level below as its children, and covers
+    #   a contiguous range of the sorted boxes, so the tree is stored without any pointers
+    # queries go down one level at a time, testing every node still in question together
+    def __init__(self, mins, maxs, leaf_size=8):
+        self.leaf_size = leaf_size
+        self.build(mins, maxs)
+
+    def build(self, mins, maxs):
+        mins = np.asarray(mins, dtype='float64')
+        maxs = np.asarray(maxs, dtype='float64')
+        self.count = len(mins)
+        self.order = np.argsort(morton_codes((mins + maxs) / 2), kind='stable') if self.count else np.zeros(0, dtype='int64')
+        # where each box ended up in the sorted order
+        self.slots = np.empty_like(self.order)
+        self.slots[self.order] = np.arange(self.count)
+        self.mins = mins[self.order]
+        self.maxs = maxs[self.order]
+        # boxes moved since the tree was built, which it gets looser with
+        self.moved_since_build = 0
+        self.refit()
+
+    # recomputes every node from the boxes, keeping the shape of the tree
+    #   level 0 holds the leaves, and the last level holds the root
+    def refit(self):
+        self.level_mins = []
+        self.level_maxs = []
+        if self.count == 0:
+            return
+        starts = np.arange(0, self.count, self.leaf_size)
+        self.level_mins.append(np.minimum.reduceat(self.mins, starts))
+        self.level_maxs.append(np.maximum.reduceat(self.maxs, starts))
+        while len(self.level_mins[-1]) > 1:
+            pairs = np.arange(0, len(self.level_mins[-1]), 2)
+            self.level_mins.append(np.minimum.reduceat(self.level_mins[-1], pairs))
+            self.level_maxs.append(np.maximum.reduceat(self.level_maxs[-1], pairs))
+
+    # replaces the boxes at the given indices, and refits only the nodes above them
+    #   once as many boxes have moved as there are in the tree, it is rebuilt instead,
+    #   so the cost of rebuilding is spread over the moves that made it necessary
+    def move(self, indices, mins, maxs):
+        slots = self.slots[indices]
+        self.mins[slots] = mins
+        self.maxs[slots] = maxs
+        self.moved_since_build += len(indices)
+        if self.moved_since_build > self.count:
+            self.build(self.mins[self.slots], self.maxs[self.slots])
+            return
+
+        # leaves are rebuilt from their boxes (the last leaf repeats its last box to fill it out)
+        nodes = np.unique(slots // self.leaf_size)
+        boxes = np.minimum(nodes[:, np.newaxis] * self.leaf_size + np.arange(self.leaf_size), self.count - 1)
+        self.level_mins[0][nodes] = self.mins[boxes].min(axis=1)
+        self.level_maxs[0][nodes] = self.maxs[boxes].max(axis=1)
+
+        # and every node above them from its two children
+        for depth in range(1, len(self.level_mins)):
+            nodes = np.unique(nodes // 2)
+            children = np.minimum(nodes[:, np.newaxis] * 2 + np.arange(2), len(self.level_mins[depth - 1]) - 1)
+            self.level_mins[depth][nodes] = self.level_mins[depth - 1][children].min(axis=1)
+            self.level_maxs[depth][nodes] = self.level_maxs[depth - 1][children].max(axis=1)
+
+    # children of the given nodes, on the level below them
+    def children(self, nodes, depth):
+        children = (nodes[:, np.newaxis] * 2 + np.arange(2)).ravel()
+        return children[children < len(self.level_mins[depth - 1])]
+
+    # range of sorted boxes under each of the given nodes
+    def box_ranges(self, nodes, depth):
+        span = self.leaf_size << depth
+        return nodes * span, np.minimum((nodes + 1) * span, self.count)
+
+    # indices of the boxes that are at least partly inside the planes (see culling.frustum_planes)
+    #   nodes entirely inside are accepted whole, and nodes entirely outside are never opened
+    def query_frustum(self, planes):
+        if self.count == 0:
+            return np.zeros(0, dtype='int64')
+
+        normals = planes[:, :3]
+        absolute_normals = np.abs(normals)
+        offsets = planes[:, 3]
+
+        accepted = []
+        nodes = np.zeros(1, dtype='int64')
+        for depth in range(len(self.level_mins) - 1, -1, -1):
+            mins = self.level_mins[depth][nodes]
+            maxs = self.level_maxs[depth][nodes]
+            distances = ((mins + maxs) / 2) @ normals.T + offsets
+            reaches = ((maxs - mins) / 2) @ absolute_normals.T
+            outside = np.any(distances < -reaches, axis=1)
+            inside = np.all(distances >= reaches, axis=1)
+
+            accepted.append(expand_ranges(*self.box_ranges(nodes[inside], depth)))
+            nodes = nodes[~(outside | inside)]
+            if depth > 0:
+                nodes = self.children(nodes, depth)
+
+        # the boxes in leaves that cross a plane are tested one by one
+        slots = expand_ranges(*self.box_ranges(nodes, 0))
+        mins = self.mins[slots]
+        maxs = self.maxs[slots]
+        accepted.append(slots[boxes_in_frustum(planes, (mins + maxs) / 2, (maxs - mins) / 2)])
+        return np.sort(self.order[np.concatenate(accepted)])
+
+    # the nearest box hit by a ray, as its index and the distance along the ray to it
+    #   (None and infinity when nothing is hit)
+    def ray_cast(self, origin, direction):
+        if self.count == 0:
+            return None, np.inf
+
+        origin = np.asarray(origin, dtype='float64')
+        direction = np.asarray(direction, dtype='float64')
+        # axis-parallel rays would divide by zero, so they are tilted by a negligible amount
+        inverse_direction = 1.0 / np.where(direction == 0.0, 1e-30, direction)
+
+        nodes = np.zeros(1, dtype='int64')
+        for depth in range(len(self.level_mins) - 1, -1, -1):
+            near, far = ray_box_distances(origin, inverse_direction, self.level_mins[depth][nodes], self.level_maxs[depth][nodes])
+            nodes = nodes[near <= far]
+            if depth > 0:
+                nodes = self.children(nodes, depth)
+
+        slots = expand_ranges(*self.box_ranges(nodes, 0))
+        near, far = ray_box_distances(origin, inverse_direction, self.mins[slots], self.maxs[slots])
+        hits = np.flatnonzero(near <= far)
+        if len(hits) == 0:
+            return None, np.inf
+        nearest = hits[np.argmin(near[hits])]
+        return int(self.order[slots[nearest]]), float(near[nearest])
+
+class SceneBVH:
+    # keeps a hierarchy over the world-space boxes of a set of rendered objects up to date
+    #   the objects that moved are found from the versions in the transform store, so only
+    #   their boxes are recomputed and only the nodes above them are refit
+    # objects added to the scene later are not included until a new one is made
+    def __init__(self, objects, leaf_size=8):
+        self.objects = list(objects)
+        self.transform_store = TransformStore.get_instance()
+        self.transform_indices = np.array([rendered_object.transform_index for rendered_object in self.objects], dtype='int64')
+
+        # objects are bounded with their mesh's box, so they are numbered by mesh
+        mesh_numbers = {}
+        self.mesh_indices = np.array([mesh_numbers.setdefault(rendered_object.mesh, len(mesh_numbers)) for rendered_object in self.objects], dtype='int64')
+        self.meshes = list(mesh_numbers)
+
+        self.transform_store.update()
+        self.version = self.transform_store.version
+        mins, maxs = self.boxes(np.arange(len(self.objects)))
+        self.hierarchy = BoundingVolumeHierarchy(mins, maxs, leaf_size)
+
+    # world-space boxes of the objects at the given indices
+    def boxes(self, indices):
+        world_matrices = self.transform_store.world_matrices[self.transform_indices[indices]]
+        mesh_indices = self.mesh_indices[indices]
+        mins = np.empty((len(indices), 3))
+        maxs = np.empty((len(indices), 3))
+        for mesh_index in np.unique(mesh_indices):
+            group = mesh_indices == mesh_index
+            _, _, centers, extents = world_bounds(self.meshes[mesh_index], world_matrices[group])
+            mins[group] = centers - extents
+            maxs[group] = centers + extents
+        return mins, maxs
+
+    # refits the hierarchy around every object that moved since the last update
+    def update(self):
+        self.transform_store.update()
+        if self.transform_store.version == self.version:
+            return
+        moved = np.flatnonzero(self.transform_store.world_versions[self.transform_indices] > self.version)
+        self.version = self.transform_store.version
+        if len(moved):
+            self.hierarchy.move(moved, *self.boxes(moved))
+
+    def query_frustum(self, camera):
+        indices = self.hierarchy.query_frustum(frustum_planes(camera.view_projection_matrix))
+        return [self.objects[index] for index in indices]
+
+    # the nearest object along the camera's line of sight (or None), and how far away it is
+    #   the ray is tested against the objects' boxes, which is close enough for picking
+    def pick(self, camera):
+        origin = np.array([camera.eye.x, camera.eye.y, camera.eye.z])
+        index, distance = self.hierarchy.ray_cast(origin, camera.look_direction)
+        return (None if index is None else self.objects[index]), distance
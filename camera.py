@@ -9,32 +9,71 @@ import sys
 class Camera:
     instance = None
 
+    # attributes that invalidate each of the cached matrices when they are assigned
+    projection_fields = ('cam_angle', 'asp_ratio', 'near', 'far')
+    view_fields = ('eye', 'yaw_angle', 'pitch_angle')
+
     @staticmethod
     def set_instance(camera):
         Camera.instance = camera
 
     def __init__(self, cam_angle=45, asp_ratio=1, near=0.1, far=1000, eye=Point(0, 0, 0), yaw_angle=0, pitch_angle=0):
+        # incremented whenever any of the matrices change, so other caches can tell
+        #   if the camera moved since they were last updated
+        self.version = 0
+        self.projection_dirty = True
+        self.view_dirty = True
+        self.view_projection_version = None
+
         self.cam_angle = cam_angle
         self.asp_ratio = asp_ratio
         self.near = near
         self.far = far
-        self.eye = eye
+        # copied, since sliding the camera moves the eye in place
+        self.eye = copy.copy(eye)
         self.yaw_angle = yaw_angle
         self.pitch_angle = pitch_angle
-        # TODO: temp value to create field. maybe unnecessary?
-        self.view_matrix = np.array([[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0], [0.0, 0.0, 0.0, 1.0]], dtype='float32')
-        self.projection_matrix = np.array([[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0], [0.0, 0.0, 0.0, 1.0]], dtype='float32')
-        # initialize view matrix once everything else is set
-        self.update_view_matrix() 
         # set instance
         Camera.set_instance(self)
 
-    def set_projection(self):
-        # glMatrixMode(GL_PROJECTION)
-
-        # glLoadIdentity()
-        self.projection_matrix = np.array([[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0], [0.0, 0.0, 0.0, 1.0]], dtype='float32')
+    # marks the matrices that depend on an attribute as out of date when it is assigned
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in Camera.projection_fields:
+            self.projection_dirty = True
+        elif name in Camera.view_fields:
+            self.view_dirty = True
+
+    # the matrices are only recomputed when they are read after something they depend on changed
+    @property
+    def projection_matrix(self):
+        if self.projection_dirty:
+            self.set_projection()
+        return self._projection_matrix
+
+    @property
+    def view_matrix(self):
+        if self.view_dirty:
+            self.update_view_matrix()
+        return self._view_matrix
+
+    # the combined matrix, taking a point in world space straight to clip space
+    @property
+    def view_projection_matrix(self):
+        view_matrix = self.view_matrix
+        projection_matrix = self.projection_matrix
+        if self.view_projection_version != self.version:
+            self._view_projection_matrix = view_matrix @ projection_matrix
+            self.view_projection_version = self.version
+        return self._view_projection_matrix
+
+    # unit vector the camera is looking along, in world space
+    #   the view matrix's third column is the opposite of it
+    @property
+    def look_direction(self):
+        return -self.view_matrix[:3, 2].astype('float64')
 
+    def set_projection(self):
         # gluPerspective(self.cam_angle, self.asp_ratio, self.near, self.far)
         f = 1 / np.tan(math.radians(self.cam_angle/2))
         perspective_matrix = np.array([
@@ -43,70 +82,43 @@ class Camera:
             [0.0, 0.0, (self.far+self.near)/(self.near-self.far), (2*self.far*self.near)/(self.near-self.far)],
             [0.0, 0.0, -1.0, 0.0]
         ], dtype='float32')
-        perspective_matrix = np.transpose(perspective_matrix)
 
-        self.projection_matrix = perspective_matrix @ self.projection_matrix
+        self._projection_matrix = np.transpose(perspective_matrix)
+        self.projection_dirty = False
+        self.version += 1
 
     def update_view_matrix(self):
-        # compute point to look at using yaw angle and pitch angle (no roll allowed)
+        # compute the direction to look in using yaw angle and pitch angle (no roll allowed)
+        #   this is already unit length
         yaw_angle_rad = math.radians(self.yaw_angle)
         pitch_angle_rad = math.radians(self.pitch_angle)
-        look_x = self.eye.x - math.sin(yaw_angle_rad) * math.cos(pitch_angle_rad)
-        look_y = self.eye.y - math.sin(pitch_angle_rad)
-        look_z = self.eye.z - math.cos(yaw_angle_rad) * math.cos(pitch_angle_rad)
-        
+        f_norm = np.array([
+            -math.sin(yaw_angle_rad) * math.cos(pitch_angle_rad),
+            -math.sin(pitch_angle_rad),
+            -math.cos(yaw_angle_rad) * math.cos(pitch_angle_rad)
+        ])
+
         # TODO: fix issues with pitch around 90 degrees (might still exist, untested?)
         # gluLookAt equivalent here (https://registry.khronos.org/OpenGL-Refpages/gl2.1/xhtml/gluLookAt.xml)
 
-        # set to identity
-        self.view_matrix = np.array([[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0], [0.0, 0.0, 0.0, 1.0]], dtype='float32')
-
-        # create center
-        center = Point(look_x, look_y, look_z)
-
-        # calc F
-        f = Vector(p=self.eye, q=center)
-
-        # normalize f and up
-        f_norm = Vector(p=self.eye, q=center) # same as f
-        f_norm.normalize()
-
-        up_norm = Vector(p=Point(0, 1, 0)) # same as up
-        up_norm.normalize()
-
-        # take cross product of fnorm and upnorm to get s
-        s = f_norm.cross(up_norm)
-        # print(s)
-
-        # normalize s
-        s_norm = f_norm.cross(up_norm) # same as s
-        s_norm.normalize()
-
-        # use snorm to find u
-        u = s_norm.cross(f_norm)
-        u.normalize() # TODO: make consistent with other vectors
-
-        # create M
-        m = np.array([
-            [s_norm.dx, s_norm.dy, s_norm.dz, 0.0],
-            [u.dx, u.dy, u.dz, 0.0],
-            [-f_norm.dx, -f_norm.dy, -f_norm.dz, 0.0],
-            [0.0, 0.0, 0.0, 1.0]
-        ], dtype='float32')
-        m = np.transpose(m)
-
-        # mult view matrix by M
-        self.view_matrix = m @ self.view_matrix
-
-        # translate matrix by (-eyex, -eyey, -eyez)
-        tm = np.array([
-            [1.0, 0.0, 0.0, -self.eye.x],
-            [0.0, 1.0, 0.0, -self.eye.y],
-            [0.0, 0.0, 1.0, -self.eye.z],
-            [0.0, 0.0, 0.0, 1.0]
-        ], dtype='float32')
-        tm = np.transpose(tm)
-        self.view_matrix = tm @ self.view_matrix
+        # take cross product of fnorm and up to get s, and use s to find u
+        s_norm = np.cross(f_norm, (0.0, 1.0, 0.0))
+        s_norm /= np.linalg.norm(s_norm)
+        u = np.cross(s_norm, f_norm)
+        u /= np.linalg.norm(u)
+
+        # M with its columns as s, u and -f, translated by (-eyex, -eyey, -eyez)
+        #   (stored transposed like every other matrix, so the translation is the last row)
+        eye = np.array([self.eye.x, self.eye.y, self.eye.z])
+        view_matrix = np.identity(4, dtype='float32')
+        view_matrix[:3, 0] = s_norm
+        view_matrix[:3, 1] = u
+        view_matrix[:3, 2] = -f_norm
+        view_matrix[3, :3] = -eye @ view_matrix[:3, :3]
+
+        self._view_matrix = view_matrix
+        self.view_dirty = False
+        self.version += 1
 
     # note: sliding does not support vertical angle adjustments
     #   the movement is always assumed to be level with the ground
@@ -126,6 +138,8 @@ class Camera:
         self.eye.x += du * u.dx + dn * n.dx
         self.eye.y += dv
         self.eye.z += du * u.dz + dn * n.dz
+        # the eye was moved in place, so it has to be marked by hand
+        self.view_dirty = True
 
     def rotate_yaw(self, angle):
         self.yaw_angle += angle
@@ -135,8 +149,7 @@ class Camera:
     #   clamping the angle between -90 and 90
     def rotate_pitch(self, angle):
         target_angle = self.pitch_angle + angle
-        self.pitch_angle = min(89, target_angle)
-        self.pitch_angle = max(-89, target_angle)
+        self.pitch_angle = max(-89, min(89, target_angle))
 
     def __repr__(self):
         return f'Camera eye at {self.eye} with yaw of {self.yaw_angle} and pitch of {self.pitch_angle}'
\ No newline at end of file
@@ -0,0 +1,103 @@
+import numpy as np
+from rendered_object import RenderedObject
+from transform_store import TransformStore
+
+# the six planes of the view frustum, as (a, b, c, d) with ax + by + cz + d >= 0 on the inside
+#   the matrix is the combined view-projection matrix (stored transposed, like every other matrix)
+def frustum_planes(view_projection_matrix):
+    clip = np.transpose(view_projection_matrix).astype('float64')
+    planes = np.array([
+        clip[3] + clip[0],  # left
+        clip[3] - clip[0],  # right
+        clip[3] + clip[1],  # bottom
+        clip[3] - clip[1],  # top
+        clip[3] + clip[2],  # near
+        clip[3] - clip[2],  # far
+    ])
+    return planes / np.linalg.norm(planes[:, :3], axis=1, keepdims=True)
+
+# which spheres are at least partly inside the planes
+def spheres_in_frustum(planes, centers, radii):
+    distances = centers @ planes[:, :3].T + planes[:, 3]
+    return np.all(distances >= -radii[:, np.newaxis], axis=1)
+
+# which boxes (given by their centers and half-extents) are at least partly inside the planes
+#   each plane is tested against the corner of the box furthest along its normal
+def boxes_in_frustum(planes, centers, extents):
+    distances = centers @ planes[:, :3].T + planes[:, 3] + extents @ np.abs(planes[:, :3]).T
+    return np.all(distances >= 0, axis=1)
+
+# the most each of many 3x3 matrices stretches any direction by (its spectral norm)
+#   for a rotation and scale that is the length of its longest row, but a matrix with shear in it
+#   (e.g. a rotated child of an unevenly scaled parent) stretches some directions further,
+#   so those few go through the exact (and much slower) norm instead
+def largest_scales(linear):
+    lengths = np.linalg.norm(linear, axis=2)
+    scales = lengths.max(axis=1)
+    dots = np.abs(np.stack([np.einsum('ni,ni->n', linear[:, i], linear[:, j]) for i, j in ((0, 1), (0, 2), (1, 2))], axis=1))
+    limits = 1e-6 * np.stack((lengths[:, 0] * lengths[:, 1], lengths[:, 0] * lengths[:, 2], lengths[:, 1] * lengths[:, 2]), axis=1)
+    sheared = np.flatnonzero(np.any(dots > limits, axis=1))
+    if len(sheared):
+        scales[sheared] = np.linalg.norm(linear[sheared], ord=2, axis=(1, 2))
+    return scales
+
+# world-space bounds of a mesh's bounding volumes under many (row-major) world matrices at once
+def world_bounds(mesh, world_matrices):
+    linear = world_matrices[:, :3, :3].astype('float64')
+    translation = world_matrices[:, 3, :3]
+
+    # the sphere grows with the largest scale along any direction
+    sphere_centers = mesh.bounding_center @ linear + translation
+    sphere_radii = mesh.bounding_radius * largest_scales(linear)
+
+    # the box stays axis aligned, so it grows to hold the rotated box
+    box_centers = sphere_centers
+    box_extents = ((mesh.aabb_max - mesh.aabb_min) / 2) @ np.abs(linear)
+    return sphere_centers, sphere_radii, box_centers, box_extents
+
+class FrustumCuller:
+    # keeps objects that are completely outside the camera's view from being drawn
+    #   the cheap sphere test rejects most objects, and the box test catches
+    #   the ones whose sphere only grazes the frustum
+    def __init__(self):
+        self.enabled = True
+        self.visible_count = 0
+        self.culled_count = 0
+
+    def cull(self, objects, camera):
+        if not self.enabled:
+            self.visible_count = len(objects)
+            self.culled_count = 0
+            return objects
+
+        planes = frustum_planes(camera.view_projection_matrix)
+        transform_store = TransformStore.get_instance()
+        transform_store.update()
+
+        # objects are tested together with everything else sharing their mesh
+        visible_objects = []
+        for mesh, instances in RenderedObject.group_by_mesh(objects).items():
+            world_matrices = transform_store.world_matrices[[rendered_object.transform_index for rendered_object in instances]]
+            sphere_centers, sphere_radii, box_centers, box_extents = world_bounds(mesh, world_matrices)
+
+            visible = spheres_in_frustum(planes, sphere_centers, sphere_radii)
+            candidates = np.flatnonzero(visible)
+            visible[candidates] = boxes_in_frustum(planes, box_centers[candidates], box_extents[candidates])
+            visible_objects.extend(instances[index] for index in np.flatnonzero(visible))
+
+        self.visible_count = len(visible_objects)
+        self.culled_count = len(objects) - len(visible_objects)
+        return visible_objects
+
+    # same as cull, for the objects in a bounding volume hierarchy (see bvh.py)
+    #   whole groups of objects are accepted or rejected at once, so this stays fast
+    #   when there are far more objects than are visible
+    def cull_hierarchy(self, hierarchy, camera):
+        hierarchy.update()
+        visible_objects = hierarchy.query_frustum(camera) if self.enabled else hierarchy.objects
+        self.visible_count = len(visible_objects)
+        self.culled_count = len(hierarchy.objects) - len(visible_objects)
+        return visible_objects
+
+    def report(self):
+        return f'{self.visible_count} visible, {self.culled_count} culled'
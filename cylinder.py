@@ -1,199 +1,135 @@
 import numpy as np
 import math
-import random
 from OpenGL.GL import *
 from rendered_object import RenderedObject
+from mesh import Mesh
 
 class Cylinder(RenderedObject):
+    # levels of detail halve the slices (and stacks) until they would go below this
+    min_lod_slices = 6
+
     # a cylinder is drawn from the base to the top, along the z-axis
     #   starting with the base's center at (0, 0, 0) and stopping with
     #   the base's center at (0, 0, 1).
     # slices is the number of points along the outer circle, and stacks
     #   is the number of layers drawn in the z-dimension
-    def __init__(self, slices, stacks):
+    # the coarser levels of detail come from the same generator, and are shared like the full mesh
+    def __init__(self, slices, stacks, color=(1.0, 1.0, 1.0, 1.0), material_index=0, lod=True):
         # force stacks and slices to create a cylinder with volume at best
         stacks = max(stacks, 1)
         slices = max(slices, 3)
 
-        # intialize vertex array object (VAO)
-        self.vao = glGenVertexArrays(1)
-        glBindVertexArray(self.vao)
-
+        super().__init__(Cylinder.registered_mesh(slices, stacks), color, material_index)
+        if lod:
+            self.lod_meshes = Cylinder.lod_chain(slices, stacks)
+
+    @staticmethod
+    def registered_mesh(slices, stacks):
+        return Mesh.get(('cylinder', slices, stacks), lambda: Cylinder.get_mesh(slices, stacks))
+
+    # the meshes of every level of detail, from the given resolution down
+    @staticmethod
+    def lod_chain(slices, stacks):
+        levels = [(slices, stacks)]
+        while levels[-1][0] // 2 >= Cylinder.min_lod_slices:
+            slices, stacks = levels[-1]
+            levels.append((slices // 2, max(stacks // 2, 1)))
+        return [Cylinder.registered_mesh(slices, stacks) for slices, stacks in levels]
+
+    # the vertex data for a given resolution (which has already been clamped), for Mesh.get
+    #   the arrays are shared between every cylinder of that resolution, so guard them against edits
+    @staticmethod
+    def get_mesh(slices, stacks):
+        mesh = Cylinder.generate_mesh(slices, stacks)
+        for array in mesh.values():
+            array.flags.writeable = False
+        return mesh
+
+    # builds the vertex data and strip indices for a cylinder using numpy broadcasting
+    @staticmethod
+    def generate_mesh(slices, stacks):
         # generate the vertices
         #   this is done in two steps: the outer curved surface, and the caps on the ends
         #   each will have different normals
-        
+        theta = np.arange(slices) * (2 * math.pi / slices)
+        circle = np.stack((np.cos(theta), np.sin(theta)), axis=1)
+
         # generating the curved surface
-        curve_vertex_position_list = []
-        curve_vertex_normals_list = []
-
-        step_around = 2 * math.pi / slices
-        step_out = 1 / stacks
-        
-        for stack_index in range(stacks + 1):
-            for slice_index in range(slices):
-                theta = 2 * math.pi / slices * slice_index
-                curve_vertex_position_list.append(math.cos(theta))
-                curve_vertex_position_list.append(math.sin(theta))
-                curve_vertex_position_list.append(stack_index * step_out)
-
-                # the normal should just be the point on the unit circle, with no z-component
-                curve_vertex_normals_list.append(math.cos(theta))
-                curve_vertex_normals_list.append(math.cos(theta))
-                curve_vertex_normals_list.append(0.0)
+        #   one ring of slices points for every stack boundary
+        ring_heights = np.arange(stacks + 1) / stacks
+        curve_positions = np.empty((stacks + 1, slices, 3))
+        curve_positions[:, :, :2] = circle
+        curve_positions[:, :, 2] = ring_heights[:, np.newaxis]
+
+        # the normal should just be the point on the unit circle, with no z-component
+        curve_normals = np.zeros((stacks + 1, slices, 3))
+        curve_normals[:, :, :2] = circle
 
         # generating the caps
-        start_cap_vertex_position_list = []
-        start_cap_vertex_normal_list = []
-        end_cap_vertex_position_list = []
-        end_cap_vertex_normal_list = []
-
-        for slice_index in range(slices):
-            theta = 2 * math.pi / slices * slice_index
-            # start cap (at the back)
-            start_cap_vertex_position_list.append(math.cos(theta))
-            start_cap_vertex_position_list.append(math.sin(theta))
-            start_cap_vertex_position_list.append(0.0)
-            start_cap_vertex_normal_list.append(0.0)
-            start_cap_vertex_normal_list.append(0.0)
-            start_cap_vertex_normal_list.append(1.0)
-
-            # end cap (at the front)
-            end_cap_vertex_position_list.append(math.cos(theta))
-            end_cap_vertex_position_list.append(math.sin(theta))
-            end_cap_vertex_position_list.append(0.0)
-            end_cap_vertex_normal_list.append(0.0)
-            end_cap_vertex_normal_list.append(0.0)
-            end_cap_vertex_normal_list.append(-1.0)
+        #   the start cap sits at the base (z = 0) facing away from the cylinder,
+        #   and the end cap sits at the top (z = 1) facing the other way
+        cap_positions = np.zeros((2, slices, 3))
+        cap_positions[:, :, :2] = circle
+        cap_positions[1, :, 2] = 1.0
+
+        cap_normals = np.zeros((2, slices, 3))
+        cap_normals[0, :, 2] = -1.0
+        cap_normals[1, :, 2] = 1.0
 
         # create numpy array with proper types for use with VBO
-        vertices = np.array([*curve_vertex_position_list, *start_cap_vertex_position_list, *end_cap_vertex_position_list], dtype='float32')
-        vertex_normals = np.array([*curve_vertex_normals_list, *start_cap_vertex_normals_list, *end_cap_vertex_normals_list], dtype='float32')
+        vertices = np.concatenate((curve_positions.reshape(-1), cap_positions.reshape(-1))).astype('float32')
+        vertex_normals = np.concatenate((curve_normals.reshape(-1), cap_normals.reshape(-1))).astype('float32')
+        num_vertices = len(vertices) // 3
 
         # generate the colors for each vertex
         #   currently, it will be a random color
-        color_list = []
-        for vertex_index in range(len(vertices) // 3):
-            color_list.append(random.random())
-            color_list.append(random.random())
-            color_list.append(random.random())
-            color_list.append(1.0)
-
-        # create numpy array with proper types for use with VBO
-        colors = np.array(color_list, dtype='float32')
+        colors = np.random.random((num_vertices, 4)).astype('float32')
+        colors[:, 3] = 1.0
+        colors = colors.reshape(-1)
 
         # generate the indices from the vertices determined earlier
         # begin by generating the outer faces that wrap around the cylinder
-        main_indices = []
+        #   each stack jumps to the next ring over at the first slice (the 0th one),
+        #   wraps around the rest of the outside by jumping between this ring and the next one,
+        #   and then repeats the first point of both rings to close the shape
+        stack_starts = np.arange(stacks)[:, np.newaxis] * slices
+        slice_offsets = np.arange(1, slices)[np.newaxis, :]
+        wrap_indices = np.stack((stack_starts + slice_offsets, stack_starts + slices + slice_offsets), axis=2)
+        main_indices = np.concatenate((
+            stack_starts + slices,
+            wrap_indices.reshape(stacks, -1),
+            stack_starts,
+            stack_starts + slices,
+        ), axis=1)
         # initially add the first point of the ring
         #   this must be done separately to prevent duplication with the last index in a stack
         #   and the first index in the nex stack overlapping.
-        main_indices.append(0)
-        for stack_index in range(stacks):
-            # jump to the next ring over at the first slice (the 0th one)
-            main_indices.append((stack_index + 1) * slices)
-            # wrap around the rest of the outside, jumping between this ring and the next one
-            for slice_index in range(1, slices):
-                main_indices.append(slice_index + stack_index * slices)
-                main_indices.append(slice_index + (stack_index + 1) * slices)
-            # repeat the first point of both rings to close the shape
-            main_indices.append(stack_index * slices)
-            main_indices.append((stack_index + 1) * slices)
+        main_indices = np.concatenate(([0], main_indices.reshape(-1)))
 
         # generate the indices for the end caps
-        bottom_indices = []
-        # start at the first slice
-        bottom_indices.append(0)
-        # adding some extra data for tracking where we are at in the triangulation
-        remaining_points = slices - 1
-        distance_from_start = 1
-        on_opposite_side = False
-        # triangulate the center by jumping between opposite sides of the start
-        while remaining_points > 1:
-            if not on_opposite_side:
-                bottom_indices.append(distance_from_start)
-                on_opposite_side = True
-            else:
-                bottom_indices.append(slices - distance_from_start)
-                distance_from_start += 1
-                on_opposite_side = False
-            remaining_points -= 1
-        # finish off the circle
-        bottom_indices.append(math.ceil(slices / 2))
-
-        top_indices = []
-        # start at the first slice
-        top_indices.append(stacks * slices)
-        # adding some extra data for tracking where we are at in the triangulation
-        remaining_points = slices - 1
-        distance_from_start = 1
-        on_opposite_side = False
-        # triangulate the center by jumping between opposite sides of the start
-        while remaining_points > 1:
-            if not on_opposite_side:
-                top_indices.append(stacks * slices + distance_from_start)
-                on_opposite_side = True
-            else:
-                top_indices.append(stacks * slices + slices - distance_from_start)
-                distance_from_start += 1
-                on_opposite_side = False
-            remaining_points -= 1
-        # finish off the circle
-        top_indices.append(stacks * slices + math.ceil(slices / 2))
+        #   triangulate the center by jumping between opposite sides of the start,
+        #   so the points are visited in the order 0, 1, n - 1, 2, n - 2, ...
+        steps = np.arange(slices)
+        cap_order = np.where(steps % 2 == 1, (steps + 1) // 2, (slices - steps // 2) % slices)
+        bottom_indices = cap_order + (stacks + 1) * slices
+        top_indices = cap_order + (stacks + 2) * slices
 
         # create numpy array with proper types for use with EBO
-        indices = np.array([
-            *main_indices,
-            0xFFFF,
-            *bottom_indices,
-            0xFFFF,
-            *top_indices,
-        ], dtype='uint16')
-        self.num_indices = len(indices)
-
-        # initialize element array buffer (EBO)
-        self.ebo = glGenBuffers(1)
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
-        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.num_indices * 16, indices, GL_STATIC_DRAW)
-
-        # initialize all VBOs
-        # vertex buffer for positions
-        # allocate a buffer object reference (will be an integer)
-        self.vert_vbo = glGenBuffers(1)
-        # specify the buffer to work with
-        glBindBuffer(GL_ARRAY_BUFFER, self.vert_vbo)
-        # populate the data of the buffer
-        glBufferData(GL_ARRAY_BUFFER, len(vertices) * 32, vertices, GL_STATIC_DRAW)
-        # set the vertex pointer for the shader
-        # note: 3 is the number of coordinates given in each vertex
-        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 0, None)
-        # enable vertex array
-        glEnableVertexAttribArray(0)
-
-        # vertex buffer for colors
-        # allocate a buffer object reference (will be an integer)
-        self.color_vbo = glGenBuffers(1)
-        # specify the buffer to work with
-        glBindBuffer(GL_ARRAY_BUFFER, self.color_vbo)
-        # populate the data of the buffer
-        glBufferData(GL_ARRAY_BUFFER, len(colors) * 32, colors, GL_STATIC_DRAW)
-        # set the vertex pointer for the shader
-        # note: 4 is the number of coordinates given in each vertex
-        glVertexAttribPointer(1, 4, GL_FLOAT, GL_FALSE, 0, None)
-        # enable vertex array
-        glEnableVertexAttribArray(1)
-
-        # unbind all objects
-        # IMPORTANT: unbind VAO first to prevent detaching buffers
-        glBindVertexArray(0)
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
-        glBindBuffer(GL_ARRAY_BUFFER, 0)
-
-    def draw_object(self): 
-        super().draw_object()
-        # rebind the vao
-        glBindVertexArray(self.vao)
-        # drawing vertices
-        glDrawElements(GL_TRIANGLE_STRIP, self.num_indices, GL_UNSIGNED_SHORT, None)
-        # unbind the vao
-        glBindVertexArray(0)
\ No newline at end of file
+        #   the largest value of the index type is reserved for restarting the strip,
+        #   so switch to 32-bit indices once the vertices no longer fit below it
+        index_dtype = np.uint16 if num_vertices < 0xFFFF else np.uint32
+        restart_index = np.iinfo(index_dtype).max
+        indices = np.concatenate((
+            main_indices,
+            [restart_index],
+            bottom_indices,
+            [restart_index],
+            top_indices,
+        )).astype(index_dtype)
+
+        return {
+            'vertices': vertices,
+            'normals': vertex_normals,
+            'colors': colors,
+            'indices': indices,
+        }
@@ -0,0 +1,117 @@
+import os
+import ctypes
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from OpenGL.GL import *
+from PIL import Image
+from gl_state import GLState
+
+class FrameCapture:
+    # saves rendered frames to disk without stalling rendering to wait for them
+    #   each frame is copied into the next of a ring of pixel buffer objects, which returns right away,
+    #   and only mapped once the ring comes back around to it, so the copy overlaps with
+    #   rendering the frames in between (a fence tells whether it has really finished)
+    # encoding and writing the images happens on a pool of threads
+    def __init__(self, width, height, directory, file_format='png', ring_size=3, workers=4):
+        self.width = width
+        self.height = height
+        self.frame_size = width * height * 4
+        self.directory = directory
+        self.file_format = file_format
+        os.makedirs(directory, exist_ok=True)
+
+        self.pixel_buffers = list(np.atleast_1d(glGenBuffers(ring_size)))
+        for pixel_buffer in self.pixel_buffers:
+            GLState.bind_buffer(GL_PIXEL_PACK_BUFFER, pixel_buffer)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self.frame_size, None, GL_STREAM_READ)
+        # left unbound, since glReadPixels writes into whatever pack buffer is bound
+        GLState.bind_buffer(GL_PIXEL_PACK_BUFFER, 0)
+
+        # the fence and frame number of whatever is in each buffer (None when it is empty)
+        self.fences = [None] * ring_size
+        self.frame_numbers = [None] * ring_size
+        self.next_buffer = 0
+        self.frame_count = 0
+
+        # saves still being encoded or written, limited so a slow disk cannot use up all the memory
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.pending_saves = []
+        self.max_pending_saves = workers * 2
+
+        # how many times a copy was not done yet when it was needed, and saves had to be waited on
+        self.readback_stalls = 0
+        self.save_stalls = 0
+
+    # starts copying the frame that was just rendered
+    def capture(self):
+        index = self.next_buffer
+        # the buffer still holds a frame from around the ring, which has to be taken out first
+        if self.fences[index] is not None:
+            self.retrieve(index)
+
+        GLState.bind_buffer(GL_PIXEL_PACK_BUFFER, self.pixel_buffers[index])
+        # with a pack buffer bound, the pointer is an offset into it, and this does not wait for the copy
+        glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        GLState.bind_buffer(GL_PIXEL_PACK_BUFFER, 0)
+
+        self.fences[index] = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        self.frame_numbers[index] = self.frame_count
+        self.frame_count += 1
+        self.next_buffer = (index + 1) % len(self.pixel_buffers)
+
+    # takes a finished frame out of its buffer and hands it to the thread pool to be saved
+    def retrieve(self, index):
+        fence = self.fences[index]
+        if glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, 0) == GL_TIMEOUT_EXPIRED:
+            self.readback_stalls += 1
+            while glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, 1000000000) == GL_TIMEOUT_EXPIRED:
+                pass
+        glDeleteSync(fence)
+        self.fences[index] = None
+
+        # copied out of the mapping, so the buffer can be reused while the image is being saved
+        GLState.bind_buffer(GL_PIXEL_PACK_BUFFER, self.pixel_buffers[index])
+        pointer = glMapBufferRange(GL_PIXEL_PACK_BUFFER, 0, self.frame_size, GL_MAP_READ_BIT)
+        pixels = np.ctypeslib.as_array((ctypes.c_ubyte * self.frame_size).from_address(pointer)).copy()
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        GLState.bind_buffer(GL_PIXEL_PACK_BUFFER, 0)
+
+        # finished saves are dropped, raising anything that went wrong in them
+        still_pending = []
+        for save in self.pending_saves:
+            if save.done():
+                save.result()
+            else:
+                still_pending.append(save)
+        self.pending_saves = still_pending
+        if len(self.pending_saves) >= self.max_pending_saves:
+            self.save_stalls += 1
+            self.pending_saves.pop(0).result()
+        self.pending_saves.append(self.executor.submit(self.save, pixels, self.frame_numbers[index]))
+
+    # runs on the thread pool, so it must not make any OpenGL calls
+    def save(self, pixels, frame_number):
+        # OpenGL's rows start at the bottom, and the alpha channel is left out since the
+        #   clear color is transparent
+        image = Image.frombuffer('RGBA', (self.width, self.height), pixels, 'raw', 'RGBA', 0, -1).convert('RGB')
+        path = os.path.join(self.directory, f'frame_{frame_number:05d}.{self.file_format}')
+        if self.file_format == 'png':
+            # a low compression level keeps PNG encoding from becoming the bottleneck
+            image.save(path, compress_level=1)
+        else:
+            image.save(path)
+
+    # saves every frame still in flight, and frees the buffers
+    def close(self):
+        for offset in range(len(self.pixel_buffers)):
+            index = (self.next_buffer + offset) % len(self.pixel_buffers)
+            if self.fences[index] is not None:
+                self.retrieve(index)
+        for save in self.pending_saves:
+            save.result()
+        self.pending_saves = []
+        self.executor.shutdown()
+        glDeleteBuffers(len(self.pixel_buffers), self.pixel_buffers)
+
+    def report(self):
+        return f'{self.frame_count} frames captured, {self.readback_stalls} readback stalls, {self.save_stalls} save stalls'
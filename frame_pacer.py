@@ -0,0 +1,113 @@
+import time
+
+class FramePacer:
+    # decides how many fixed simulation steps each frame runs, and when frames are drawn
+    #   the simulation always advances by the same time step, however long frames take,
+    #   so animations run at the same speed on slow and fast machines
+    # frames can be paced three ways:
+    #   uncapped: drawn as fast as possible
+    #   vsync: drawn at the display's refresh rate (the buffer swap waits for it)
+    #   target: drawn at a fixed rate, sleeping out whatever is left of each frame
+    modes = ('uncapped', 'vsync', 'target')
+
+    def __init__(self, mode='target', target_fps=60, tick_rate=60, frame_budget=None, max_steps=5):
+        if mode not in FramePacer.modes:
+            raise ValueError(f'unknown frame pacing mode {mode!r}, expected one of {", ".join(FramePacer.modes)}')
+        self.mode = mode
+        self.frame_period = 1 / target_fps
+        self.time_step = 1 / tick_rate
+        # how long the work of a frame should take, in seconds (the frame period unless given)
+        #   frames over it are drawn more cheaply, and then skipped, until it is met again
+        self.frame_budget = self.frame_period if frame_budget is None else frame_budget
+        # the most steps a frame can run, so a long stall cannot make the simulation fall further
+        #   and further behind trying to catch up (the time beyond it is dropped instead)
+        self.max_steps = max_steps
+
+        # simulated time not yet used up by a whole step
+        self.accumulator = 0.0
+        self.frame_start = None
+        self.next_deadline = None
+        # when the last frame's buffers started to be swapped, if they were
+        self.present_start = None
+        # the time spent working on the last frame (not waiting), and on recent drawn frames,
+        #   smoothed over the last few of them (skipped frames take next to no time, so they are left out)
+        self.work_time = 0.0
+        self.smoothed_work_time = 0.0
+        self.rendered_last_frame = True
+
+        self.frame_count = 0
+        self.step_count = 0
+        self.skipped_count = 0
+        self.degraded_count = 0
+        self.dropped_time = 0.0
+
+    # starts a frame, returning how many simulation steps it should run
+    def begin_frame(self):
+        now = time.perf_counter()
+        if self.frame_start is None:
+            self.next_deadline = now
+            elapsed = self.time_step
+        else:
+            elapsed = now - self.frame_start
+        self.frame_start = now
+
+        self.accumulator += elapsed
+        steps = int(self.accumulator // self.time_step)
+        if steps > self.max_steps:
+            self.dropped_time += (steps - self.max_steps) * self.time_step
+            self.accumulator -= (steps - self.max_steps) * self.time_step
+            steps = self.max_steps
+        self.accumulator -= steps * self.time_step
+        self.step_count += steps
+        self.frame_count += 1
+        return steps
+
+    # how far the frame is between the last simulation step and the next one, from 0 to 1
+    @property
+    def alpha(self):
+        return self.accumulator / self.time_step
+
+    # whether frames are taking longer than the budget, and should be drawn more cheaply
+    @property
+    def degraded(self):
+        return self.smoothed_work_time > self.frame_budget
+
+    # a frame is skipped when the last one ran over its budget, which gives the simulation
+    #   that frame's time to catch up in, but never twice in a row, so something is always drawn
+    def should_render(self):
+        render = not self.rendered_last_frame or self.work_time <= self.frame_budget
+        if not render:
+            self.skipped_count += 1
+        elif self.degraded:
+            self.degraded_count += 1
+        self.rendered_last_frame = render
+        return render
+
+    # marks the end of a drawn frame's work, right before its buffers are swapped
+    def present(self):
+        self.present_start = time.perf_counter()
+
+    # ends a frame, waiting until the next one is due when pacing to a target rate
+    def end_frame(self):
+        now = time.perf_counter()
+        # with vsync, the swap is what waits for the display's next refresh, so counting it would make
+        #   every frame look a whole refresh long (and over budget): the work stops where the swap starts
+        work_end = now
+        if self.mode == 'vsync' and self.present_start is not None:
+            work_end = self.present_start
+        self.present_start = None
+        self.work_time = work_end - self.frame_start
+        if self.rendered_last_frame:
+            self.smoothed_work_time += 0.1 * (self.work_time - self.smoothed_work_time)
+
+        if self.mode == 'target':
+            # deadlines are a whole period apart, so a frame that finishes early does not
+            #   shift every frame after it, but one that ran late does not try to make up the time
+            self.next_deadline = max(self.next_deadline + self.frame_period, now)
+            remaining = self.next_deadline - now
+            if remaining > 0:
+                time.sleep(remaining)
+
+    def report(self):
+        return (f'{self.frame_count} frames, {self.step_count} simulation steps, {self.skipped_count} skipped, '
+                f'{self.degraded_count} degraded, {self.dropped_time:.3f}s of simulation dropped')
@@ -0,0 +1,159 @@
+import ctypes
+import numpy as np
+from OpenGL.GL import *
+from gl_state import GLState
+from mesh import Mesh
+from vertex_format import compact_format
+
+class GeometryArena:
+    # the arena shared by every mesh
+    instance = None
+
+    @staticmethod
+    def get_instance():
+        if GeometryArena.instance is None:
+            GeometryArena.instance = GeometryArena()
+        return GeometryArena.instance
+
+    # the layout the vertices are stored in (see vertex_format.py), which has to be chosen
+    #   before the arena is first used
+    vertex_format = compact_format
+
+    # one record per draw, laid out as OpenGL reads it from the indirect buffer
+    command_dtype = np.dtype([('count', 'uint32'), ('instance_count', 'uint32'), ('first_index', 'uint32'), ('base_vertex', 'int32'), ('base_instance', 'uint32')])
+
+    # every mesh is suballocated out of one interleaved vertex buffer and one 32-bit index buffer,
+    #   behind a single vertex array object, so drawing any mix of meshes needs no rebinding
+    # a mesh is added the first time it is drawn, and keeps its place from then on
+    # a whole pass is drawn with one glMultiDrawElementsIndirect, with a command per mesh:
+    #   base_vertex offsets the mesh's indices to where its vertices are, and base_instance
+    #   to where its instances start in the shared instance buffer
+    def __init__(self, vertex_capacity=1 << 12, index_capacity=1 << 14):
+        self.vertex_count = 0
+        self.index_count = 0
+        # the first index and base vertex of each mesh
+        self.ranges = {}
+
+        self.vertex_format = GeometryArena.vertex_format
+        self.vao = glGenVertexArrays(1)
+        self.vbo = glGenBuffers(1)
+        self.ebo = glGenBuffers(1)
+        self.instance_vbo = glGenBuffers(1)
+        self.instance_capacity = 0
+        self.indirect_buffer = glGenBuffers(1)
+        self.indirect_capacity = 0
+
+        self.vertex_capacity = vertex_capacity
+        self.index_capacity = index_capacity
+        GLState.bind_buffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, vertex_capacity * self.vertex_format.stride, None, GL_STATIC_DRAW)
+        GLState.bind_buffer(GL_ARRAY_BUFFER, self.ebo)
+        glBufferData(GL_ARRAY_BUFFER, index_capacity * 4, None, GL_STATIC_DRAW)
+        self.set_attributes()
+
+    # points the vertex array at the current buffers (again whenever one is replaced)
+    def set_attributes(self):
+        GLState.bind_vertex_array(self.vao)
+        GLState.bind_buffer(GL_ARRAY_BUFFER, self.vbo)
+        self.vertex_format.set_attributes()
+        GLState.bind_buffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+        GLState.bind_buffer(GL_ARRAY_BUFFER, self.instance_vbo)
+        Mesh.set_instance_attributes()
+        GLState.bind_vertex_array(0)
+        GLState.bind_buffer(GL_ARRAY_BUFFER, 0)
+
+    # a copy of a buffer with room for new_size bytes, keeping its first size bytes
+    #   (the copy stays on the GPU, and the old buffer is deleted)
+    @staticmethod
+    def grow_buffer(buffer, size, new_size):
+        new_buffer = glGenBuffers(1)
+        GLState.bind_buffer(GL_COPY_WRITE_BUFFER, new_buffer)
+        glBufferData(GL_COPY_WRITE_BUFFER, new_size, None, GL_STATIC_DRAW)
+        GLState.bind_buffer(GL_COPY_READ_BUFFER, buffer)
+        glCopyBufferSubData(GL_COPY_READ_BUFFER, GL_COPY_WRITE_BUFFER, 0, 0, size)
+        GLState.delete_buffer(buffer)
+        return new_buffer
+
+    # makes room for more vertices and indices, doubling the buffers as many times as needed
+    def reserve(self, vertex_count, index_count):
+        vertex_capacity = self.vertex_capacity
+        while vertex_capacity < vertex_count:
+            vertex_capacity *= 2
+        index_capacity = self.index_capacity
+        while index_capacity < index_count:
+            index_capacity *= 2
+        if vertex_capacity == self.vertex_capacity and index_capacity == self.index_capacity:
+            return
+
+        stride = self.vertex_format.stride
+        self.vbo = GeometryArena.grow_buffer(self.vbo, self.vertex_count * stride, vertex_capacity * stride)
+        self.ebo = GeometryArena.grow_buffer(self.ebo, self.index_count * 4, index_capacity * 4)
+        self.vertex_capacity = vertex_capacity
+        self.index_capacity = index_capacity
+        self.set_attributes()
+
+    # copies a mesh's geometry into the arena
+    def add(self, mesh):
+        vertex_count = len(mesh.vertices) // 3
+        self.reserve(self.vertex_count + vertex_count, self.index_count + mesh.num_indices)
+
+        vertices = self.vertex_format.pack(vertices=mesh.vertices, colors=mesh.colors, normals=mesh.normals)
+        GLState.bind_buffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferSubData(GL_ARRAY_BUFFER, self.vertex_count * self.vertex_format.stride, vertices.nbytes, vertices)
+
+        # every index becomes 32 bits, so the restart index of 16-bit meshes has to move up with it
+        #   (restarts are checked before the base vertex is added, so they still match afterwards)
+        indices = np.asarray(mesh.indices)
+        restarts = indices == np.iinfo(indices.dtype).max
+        indices = indices.astype('uint32')
+        indices[restarts] = 0xFFFFFFFF
+        GLState.bind_buffer(GL_ARRAY_BUFFER, self.ebo)
+        glBufferSubData(GL_ARRAY_BUFFER, self.index_count * 4, indices.nbytes, indices)
+
+        self.ranges[mesh] = (self.index_count, self.vertex_count)
+        self.vertex_count += vertex_count
+        self.index_count += len(indices)
+
+    def get_range(self, mesh):
+        if mesh not in self.ranges:
+            self.add(mesh)
+        return self.ranges[mesh]
+
+    # draws runs of instances, given as (mesh, objects) pairs, with one multi-draw per primitive mode
+    #   (every mesh so far is a triangle strip, so that is a single call)
+    def draw(self, batches):
+        objects = [rendered_object for _, instances in batches for rendered_object in instances]
+        if not objects:
+            return
+        self.instance_capacity = Mesh.upload_instances(self.instance_vbo, self.instance_capacity, Mesh.pack_instances(objects))
+
+        commands = np.empty(len(batches), dtype=GeometryArena.command_dtype)
+        modes = np.empty(len(batches), dtype='int64')
+        base_instance = 0
+        for command, (mesh, instances) in enumerate(batches):
+            first_index, base_vertex = self.get_range(mesh)
+            commands[command] = (mesh.num_indices, len(instances), first_index, base_vertex, base_instance)
+            modes[command] = mesh.mode
+            base_instance += len(instances)
+        # commands of the same mode have to be next to each other to go out together
+        order = np.argsort(modes, kind='stable')
+        commands = commands[order]
+        modes = modes[order]
+
+        GLState.bind_buffer(GL_DRAW_INDIRECT_BUFFER, self.indirect_buffer)
+        if len(commands) > self.indirect_capacity:
+            self.indirect_capacity = 1 << (len(commands) - 1).bit_length()
+            glBufferData(GL_DRAW_INDIRECT_BUFFER, self.indirect_capacity * GeometryArena.command_dtype.itemsize, None, GL_STREAM_DRAW)
+        glBufferSubData(GL_DRAW_INDIRECT_BUFFER, 0, commands.nbytes, commands)
+
+        GLState.bind_vertex_array(self.vao)
+        starts = np.flatnonzero(np.concatenate(([True], modes[1:] != modes[:-1])))
+        ends = np.append(starts[1:], len(modes))
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            offset = start * GeometryArena.command_dtype.itemsize
+            glMultiDrawElementsIndirect(int(modes[start]), GL_UNSIGNED_INT, ctypes.c_void_p(offset), end - start, 0)
+
+    def report(self):
+        vertex_bytes = self.vertex_count * self.vertex_format.stride
+        return (f'{len(self.ranges)} meshes, {self.vertex_count} vertices ({vertex_bytes / 1024:.1f} KiB at {self.vertex_format.stride} bytes each) '
+                f'and {self.index_count} indices ({self.index_count * 4 / 1024:.1f} KiB) in shared buffers')
@@ -0,0 +1,108 @@
+import numpy as np
+from OpenGL.GL import *
+
+class GLState:
+    # thin cache over the OpenGL state that gets set repeatedly every frame
+    #   calls that would not change anything are skipped, and counted so the
+    #   savings can be measured
+    program = None
+    vertex_array = None
+    buffers = {}
+    uniforms = {}
+
+    # number of calls sent to OpenGL and skipped, by function name
+    issued = {}
+    elided = {}
+
+    @staticmethod
+    def count(name, changed):
+        counters = GLState.issued if changed else GLState.elided
+        counters[name] = counters.get(name, 0) + 1
+        return changed
+
+    # forgets everything that is cached, for when OpenGL state was changed some other way
+    #   (e.g. after a new context was created)
+    @staticmethod
+    def reset():
+        GLState.program = None
+        GLState.vertex_array = None
+        GLState.buffers = {}
+        GLState.uniforms = {}
+
+    @staticmethod
+    def reset_counters():
+        GLState.issued = {}
+        GLState.elided = {}
+
+    @staticmethod
+    def use_program(program):
+        if GLState.count('glUseProgram', program != GLState.program):
+            glUseProgram(program)
+            GLState.program = program
+
+    @staticmethod
+    def bind_vertex_array(vao):
+        if GLState.count('glBindVertexArray', vao != GLState.vertex_array):
+            glBindVertexArray(vao)
+            GLState.vertex_array = vao
+            # the element array buffer binding belongs to the VAO, so it is no longer known
+            GLState.buffers.pop(GL_ELEMENT_ARRAY_BUFFER, None)
+
+    @staticmethod
+    def bind_buffer(target, buffer):
+        if GLState.count('glBindBuffer', GLState.buffers.get(target) != buffer):
+            glBindBuffer(target, buffer)
+            GLState.buffers[target] = buffer
+
+    # deletes a buffer, and forgets wherever it was bound, since OpenGL can give its name out again
+    @staticmethod
+    def delete_buffer(buffer):
+        glDeleteBuffers(1, [buffer])
+        GLState.buffers = {target: bound for target, bound in GLState.buffers.items() if bound != buffer}
+
+    # binding to an indexed binding point also binds the buffer to the generic target
+    @staticmethod
+    def bind_buffer_base(target, index, buffer):
+        glBindBufferBase(target, index, buffer)
+        GLState.count('glBindBufferBase', True)
+        GLState.buffers[target] = buffer
+
+    # uniforms are cached by the program they belong to, since each program keeps its own values
+    @staticmethod
+    def uniform_changed(name, location, value):
+        key = (GLState.program, location)
+        if GLState.count(name, GLState.uniforms.get(key) != value):
+            GLState.uniforms[key] = value
+            return True
+        return False
+
+    @staticmethod
+    def uniform_matrix4fv(location, matrix):
+        matrix = np.ascontiguousarray(matrix, dtype='float32')
+        if GLState.uniform_changed('glUniformMatrix4fv', location, matrix.tobytes()):
+            glUniformMatrix4fv(location, 1, GL_FALSE, matrix)
+
+    @staticmethod
+    def uniform3f(location, x, y, z):
+        if GLState.uniform_changed('glUniform3f', location, (x, y, z)):
+            glUniform3f(location, x, y, z)
+
+    @staticmethod
+    def uniform1f(location, x):
+        if GLState.uniform_changed('glUniform1f', location, x):
+            glUniform1f(location, x)
+
+    @staticmethod
+    def uniform1i(location, x):
+        if GLState.uniform_changed('glUniform1i', location, x):
+            glUniform1i(location, x)
+
+    # summary of the counters, one line per function
+    @staticmethod
+    def report():
+        lines = []
+        for name in sorted(set(GLState.issued) | set(GLState.elided)):
+            issued = GLState.issued.get(name, 0)
+            elided = GLState.elided.get(name, 0)
+            lines.append(f'{name}: {issued} issued, {elided} elided')
+        return '\n'.join(lines)
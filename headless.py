@@ -0,0 +1,93 @@
+import os
+import ctypes
+import numpy as np
+from OpenGL.GL import *
+
+# rendering without a window, for machines with no display (render nodes, CI)
+#   the context comes from EGL or OSMesa instead of pygame, and both work with
+#   Mesa's llvmpipe software renderer, so no GPU is needed either
+# PyOpenGL picks its platform when OpenGL is first imported, so PYOPENGL_PLATFORM has to be
+#   set (to 'egl' or 'osmesa') before this module is (see the top of main.py)
+
+class HeadlessContext:
+    # the OpenGL version the shaders are written for
+    major_version = 4
+    minor_version = 5
+
+    # an OpenGL context without a window, drawing into a framebuffer object of the given size
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        if os.environ.get('PYOPENGL_PLATFORM') == 'osmesa':
+            self.create_osmesa_context()
+        else:
+            self.create_egl_context()
+        self.create_framebuffer()
+
+    # each platform's bindings only load on that platform, so they are imported when used
+    def create_egl_context(self):
+        from OpenGL import EGL
+
+        self.display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        if not EGL.eglInitialize(self.display, None, None):
+            raise RuntimeError('could not initialize EGL')
+
+        # the context is only ever used with the framebuffer object, but a config is still required
+        config = EGL.EGLConfig()
+        config_count = EGL.EGLint()
+        config_attributes = (EGL.EGLint * 5)(EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT, EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT, EGL.EGL_NONE)
+        if not EGL.eglChooseConfig(self.display, config_attributes, ctypes.pointer(config), 1, ctypes.pointer(config_count)) or config_count.value == 0:
+            raise RuntimeError('no EGL config supports desktop OpenGL')
+
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        context_attributes = (EGL.EGLint * 7)(
+            EGL.EGL_CONTEXT_MAJOR_VERSION, HeadlessContext.major_version,
+            EGL.EGL_CONTEXT_MINOR_VERSION, HeadlessContext.minor_version,
+            EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK, EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT,
+            EGL.EGL_NONE,
+        )
+        self.context = EGL.eglCreateContext(self.display, config, EGL.EGL_NO_CONTEXT, context_attributes)
+        if self.context == EGL.EGL_NO_CONTEXT:
+            raise RuntimeError(f'could not create an OpenGL {HeadlessContext.major_version}.{HeadlessContext.minor_version} core context with EGL')
+        # no surface is needed, since everything is drawn into the framebuffer object
+        EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, self.context)
+
+    def create_osmesa_context(self):
+        from OpenGL import osmesa
+
+        context_attributes = (ctypes.c_int * 9)(
+            osmesa.OSMESA_FORMAT, osmesa.OSMESA_RGBA,
+            osmesa.OSMESA_PROFILE, osmesa.OSMESA_CORE_PROFILE,
+            osmesa.OSMESA_CONTEXT_MAJOR_VERSION, HeadlessContext.major_version,
+            osmesa.OSMESA_CONTEXT_MINOR_VERSION, HeadlessContext.minor_version,
+            0,
+        )
+        self.context = osmesa.OSMesaCreateContextAttribs(context_attributes, None)
+        if not self.context:
+            raise RuntimeError(f'could not create an OpenGL {HeadlessContext.major_version}.{HeadlessContext.minor_version} core context with OSMesa')
+        # OSMesa always draws into a buffer in memory, even though the framebuffer object replaces it
+        self.osmesa_buffer = np.zeros((self.height, self.width, 4), dtype=np.uint8)
+        osmesa.OSMesaMakeCurrent(self.context, self.osmesa_buffer, GL_UNSIGNED_BYTE, self.width, self.height)
+
+    # color and depth renderbuffers to draw into, in place of a window's default framebuffer
+    def create_framebuffer(self):
+        self.framebuffer = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer)
+        self.color_renderbuffer, self.depth_renderbuffer = glGenRenderbuffers(2)
+
+        glBindRenderbuffer(GL_RENDERBUFFER, self.color_renderbuffer)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, self.width, self.height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.color_renderbuffer)
+
+        glBindRenderbuffer(GL_RENDERBUFFER, self.depth_renderbuffer)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, self.width, self.height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.depth_renderbuffer)
+
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError('the headless framebuffer is incomplete')
+        glViewport(0, 0, self.width, self.height)
+
+    # the rendered image as rows of RGBA pixels, top row first
+    def read_pixels(self):
+        pixels = np.frombuffer(glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE), dtype=np.uint8)
+        return pixels.reshape(self.height, self.width, 4)[::-1]
@@ -0,0 +1,75 @@
+import math
+import numpy as np
+from transform_store import TransformStore
+from culling import largest_scales
+
+class LevelOfDetail:
+    # swaps objects that have a chain of meshes (lod_meshes, most detailed first) to a coarser one
+    #   the smaller they appear on screen
+    # the level comes from the object's size on screen: each level halves the detail, and is
+    #   used once the object is half the size the level before it was chosen at
+    # a level is kept until the size moves a little past either of its boundaries (the hysteresis),
+    #   so an object sitting right on a boundary does not keep popping between two levels
+    def __init__(self, full_detail_size=0.5, hysteresis=0.15):
+        # the size on screen (as a fraction of the screen's height) below which detail starts to drop
+        self.full_detail_size = full_detail_size
+        # how far past a boundary the size has to go, in levels, before the level changes
+        self.hysteresis = hysteresis
+        self.enabled = True
+
+        # triangles in the last frame, as they were drawn and as they would have been at full detail
+        self.drawn_triangles = 0
+        self.full_triangles = 0
+        self.switch_count = 0
+
+    # picks a level for each of the objects that has a chain of meshes, and switches its mesh to it
+    def select(self, objects, camera):
+        objects = [rendered_object for rendered_object in objects if rendered_object.lod_meshes is not None]
+        if not objects:
+            self.drawn_triangles = self.full_triangles = self.switch_count = 0
+            return
+
+        transform_store = TransformStore.get_instance()
+        transform_store.update()
+        transform_indices = [rendered_object.transform_index for rendered_object in objects]
+        world_matrices = transform_store.world_matrices[transform_indices].astype('float64')
+        full_meshes = [rendered_object.lod_meshes[0] for rendered_object in objects]
+        centers = np.array([mesh.bounding_center for mesh in full_meshes])
+        radii = np.array([mesh.bounding_radius for mesh in full_meshes])
+
+        # the bounding sphere's diameter over the height of the view at its distance
+        #   (and the largest possible size once the camera is inside it)
+        world_centers = np.einsum('ni,nij->nj', centers, world_matrices[:, :3, :3]) + world_matrices[:, 3, :3]
+        world_radii = radii * largest_scales(world_matrices[:, :3, :3])
+        distances = np.linalg.norm(world_centers - (camera.eye.x, camera.eye.y, camera.eye.z), axis=1)
+        view_heights = 2 * np.maximum(distances, 1e-9) * math.tan(math.radians(camera.cam_angle) / 2)
+        sizes = np.minimum(2 * world_radii / view_heights, 1.0)
+
+        if self.enabled:
+            # the level, continuously: 0 at full_detail_size and above, 1 at half of it, and so on
+            wanted = np.log2(self.full_detail_size / np.maximum(sizes, 1e-12))
+            current = np.array([rendered_object.lod_level for rendered_object in objects])
+            last_levels = np.array([len(rendered_object.lod_meshes) - 1 for rendered_object in objects])
+            keep = (wanted >= current - self.hysteresis) & (wanted < current + 1 + self.hysteresis)
+            levels = np.where(keep, current, np.clip(np.floor(wanted), 0, last_levels)).astype('int64')
+        else:
+            levels = np.zeros(len(objects), dtype='int64')
+
+        drawn_triangles = 0
+        full_triangles = 0
+        switch_count = 0
+        for rendered_object, level in zip(objects, levels.tolist()):
+            if level != rendered_object.lod_level:
+                rendered_object.lod_level = level
+                rendered_object.mesh = rendered_object.lod_meshes[level]
+                switch_count += 1
+            drawn_triangles += rendered_object.mesh.triangle_count
+            full_triangles += rendered_object.lod_meshes[0].triangle_count
+        self.drawn_triangles = drawn_triangles
+        self.full_triangles = full_triangles
+        self.switch_count = switch_count
+
+    def report(self):
+        saved = self.full_triangles - self.drawn_triangles
+        share = saved / self.full_triangles if self.full_triangles else 0.0
+        return f'{saved} of {self.full_triangles} triangles saved ({share:.0%}), {self.switch_count} level switches'
@@ -1,15 +1,66 @@
+import numpy as np
 from OpenGL.GL import *
+from gl_state import GLState
 from camera import *
 
 class Light:
     all_lights = []
 
+    # must match maxLights and the LightBlock binding in shader.frag
+    max_lights = 10
+    binding = 0
+
+    # std140 layout of LightProperties in shader.frag
+    #   bools are 4 bytes, and each vec3 is aligned to 16 bytes so a scalar can fill its last 4
+    dtype = np.dtype({
+        'names': ['ambient', 'isEnabled', 'color', 'isLocal', 'position', 'isSpot', 'halfVector', 'spotCosCutoff',
+                  'coneDirection', 'spotExponent', 'constantAttenuation', 'linearAttenuation', 'quadraticAttenuation', 'specularStrength'],
+        'formats': [('float32', 3), 'int32', ('float32', 3), 'int32', ('float32', 3), 'int32', ('float32', 3), 'float32',
+                    ('float32', 3), 'float32', 'float32', 'float32', 'float32', 'float32'],
+        'offsets': [0, 12, 16, 28, 32, 44, 48, 60, 64, 76, 80, 84, 88, 92],
+        'itemsize': 96,
+    })
+
+    # which field of the uniform block each attribute is mirrored into
+    #   the position is left out, since the block holds it in eye space
+    fields = {
+        'is_enabled': 'isEnabled',
+        'is_local': 'isLocal',
+        'is_spot': 'isSpot',
+        'ambient': 'ambient',
+        'color': 'color',
+        'half_vector': 'halfVector',
+        'cone_direction': 'coneDirection',
+        'spot_cos_cutoff': 'spotCosCutoff',
+        'spot_exponent': 'spotExponent',
+        'constant_attenuation': 'constantAttenuation',
+        'linear_attenuation': 'linearAttenuation',
+        'quadratic_attenuation': 'quadraticAttenuation',
+        'specular_strength': 'specularStrength',
+    }
+
+    # packed copy of the uniform buffer, and the range of lights changed since the last upload
+    buffer_data = np.zeros(max_lights, dtype=dtype)
+    ubo = None
+    dirty_start = max_lights
+    dirty_end = 0
+
+    # the eye-space positions only need recomputing when the camera or a light moves
+    positions_dirty = True
+    camera_version = None
+
+    # attributes that decide which specialization of shader.frag the lights need,
+    #   and the defines for it (recomputed after any of them change)
+    feature_fields = ('is_enabled', 'is_local', 'is_spot')
+    defines = None
+
     # TODO: implement in a more strategic manner
-    def __init__(self, index, program, is_enabled=True, is_local=False, is_spot=False, ambient=(0.0, 0.0, 0.0), color=(1.0, 1.0, 1.0), position=(0.0, 0.0, 0.0), half_vector=(0.0, 0.0, 0.0), cone_direction=(0.0, 0.0, 0.0), spot_cos_cutoff=0, spot_exponent=0, constant_attenuation=1, linear_attenuation=0, quadratic_attenuation=0, specular_strength=0):
+    def __init__(self, index, program=None, is_enabled=True, is_local=False, is_spot=False, ambient=(0.0, 0.0, 0.0), color=(1.0, 1.0, 1.0), position=(0.0, 0.0, 0.0), half_vector=(0.0, 0.0, 0.0), cone_direction=(0.0, 0.0, 0.0), spot_cos_cutoff=0, spot_exponent=0, constant_attenuation=1, linear_attenuation=0, quadratic_attenuation=0, specular_strength=0):
         self.index = index
         self.program = program
-        
+
         # load in the values, store in object memory
+        #   each assignment is also written into the packed buffer (see __setattr__)
         self.is_enabled = is_enabled
         self.is_local = is_local
         self.is_spot = is_spot
@@ -25,42 +76,73 @@ class Light:
         self.quadratic_attenuation = quadratic_attenuation
         self.specular_strength = specular_strength
 
-        # retrieve the uniform locations
-        self.is_enabled_loc = glGetUniformLocation(self.program, f'lights[{index}].isEnabled')
-        self.is_local_loc = glGetUniformLocation(self.program, f'lights[{index}].isLocal')
-        self.is_spot_loc = glGetUniformLocation(self.program, f'lights[{index}].isSpot')
-        self.ambient_loc = glGetUniformLocation(self.program, f'lights[{index}].ambient')
-        self.color_loc = glGetUniformLocation(self.program, f'lights[{index}].color')
-        self.position_loc = glGetUniformLocation(self.program, f'lights[{index}].position')
-        self.half_vector_loc = glGetUniformLocation(self.program, f'lights[{index}].halfVector')
-        self.cone_direction_loc = glGetUniformLocation(self.program, f'lights[{index}].coneDirection')
-        self.spot_cos_cutoff_loc = glGetUniformLocation(self.program, f'lights[{index}].spotCosCutoff')
-        self.spot_exponent_loc = glGetUniformLocation(self.program, f'lights[{index}].spotExponent')
-        self.constant_attenuation_loc = glGetUniformLocation(self.program, f'lights[{index}].constantAttenuation')
-        self.linear_attenuation_loc = glGetUniformLocation(self.program, f'lights[{index}].linearAttenuation')
-        self.quadratic_attenuation_loc = glGetUniformLocation(self.program, f'lights[{index}].quadraticAttenuation')
-        self.specular_strength_loc = glGetUniformLocation(self.program, f'lights[{index}].specularStrength')
-
-        # TODO: check if still necessary
-        # assign initial values
-        # self.assign_uniform_values()
-
         # add light to all lights list
         Light.all_lights.append(self)
+        Light.defines = None
+
+    # keeps the packed buffer in sync with the light's attributes
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in Light.fields:
+            Light.buffer_data[Light.fields[name]][self.index] = value
+            Light.mark_dirty(self.index, self.index + 1)
+        elif name == 'position':
+            Light.positions_dirty = True
+        if name in Light.feature_fields:
+            Light.defines = None
+
+    @staticmethod
+    def mark_dirty(start, end):
+        Light.dirty_start = min(Light.dirty_start, start)
+        Light.dirty_end = max(Light.dirty_end, end)
+
+    # defines that specialize shader.frag for the lights that exist, so it only loops over
+    #   the slots in use and only keeps the code for the kinds of lights among them
+    @staticmethod
+    def shader_defines():
+        if Light.defines is None:
+            lights = [light for light in Light.all_lights if light.is_enabled]
+            light_count = max((light.index + 1 for light in lights), default=0)
+            Light.defines = {'LIGHT_COUNT': light_count}
+            # slots below the count without an enabled light in them still have to be skipped
+            if len({light.index for light in lights}) < light_count:
+                Light.defines['SKIP_DISABLED'] = 1
+            if any(light.is_local for light in lights):
+                Light.defines['ANY_LOCAL'] = 1
+            if any(not light.is_local for light in lights):
+                Light.defines['ANY_DIRECTIONAL'] = 1
+            # spot lights are always local, the cone is ignored on directional lights
+            if any(light.is_local and light.is_spot for light in lights):
+                Light.defines['ANY_SPOT'] = 1
+        return Light.defines
+
+    # brings the uniform buffer up to date, should be called once per frame
+    #   light positions are transformed into eye space for every light at once,
+    #   and only the range of lights that changed is uploaded
+    @staticmethod
+    def update_all(camera):
+        if Light.all_lights and (Light.positions_dirty or camera.version != Light.camera_version):
+            view_matrix = camera.view_matrix
+            indices = np.array([light.index for light in Light.all_lights])
+            positions = np.ones((len(indices), 4), dtype='float32')
+            positions[:, :3] = [light.position for light in Light.all_lights]
+            Light.buffer_data['position'][indices] = (positions @ view_matrix)[:, :3]
+            Light.mark_dirty(indices.min(), indices.max() + 1)
+            Light.positions_dirty = False
+            Light.camera_version = camera.version
+
+        if Light.ubo is None:
+            # allocate the buffer with every light in it, and attach it to the block's binding point
+            Light.ubo = glGenBuffers(1)
+            GLState.bind_buffer(GL_UNIFORM_BUFFER, Light.ubo)
+            glBufferData(GL_UNIFORM_BUFFER, Light.buffer_data.nbytes, Light.buffer_data, GL_DYNAMIC_DRAW)
+            GLState.bind_buffer_base(GL_UNIFORM_BUFFER, Light.binding, Light.ubo)
+        elif Light.dirty_start < Light.dirty_end:
+            dirty_data = Light.buffer_data[Light.dirty_start:Light.dirty_end]
+            GLState.bind_buffer(GL_UNIFORM_BUFFER, Light.ubo)
+            glBufferSubData(GL_UNIFORM_BUFFER, Light.dirty_start * Light.dtype.itemsize, dirty_data.nbytes, dirty_data)
+        else:
+            return
 
-    def assign_uniform_values(self, modelview_matrix):
-        glUniform1i(self.is_enabled_loc, 1 if self.is_enabled else 0)
-        glUniform1i(self.is_local_loc, 1 if self.is_local else 0)
-        glUniform1i(self.is_spot_loc, 1 if self.is_spot else 0)
-        glUniform3f(self.ambient_loc, *self.ambient)
-        glUniform3f(self.color_loc, *self.color)
-        # glUniform3f(self.position_loc, *(list(map(lambda x : x.item(), (*self.position, 1.0) @ modelview_matrix)))[:3],) # transform light based on modelview # local light
-        glUniform3f(self.position_loc, *(list(map(lambda x : x.item(), (*self.position, 1.0) @ Camera.instance.view_matrix)))[:3],)
-        glUniform3f(self.half_vector_loc, *self.half_vector)
-        glUniform3f(self.cone_direction_loc, *self.cone_direction)
-        glUniform1f(self.spot_cos_cutoff_loc, self.spot_cos_cutoff)
-        glUniform1f(self.spot_exponent_loc, self.spot_exponent)
-        glUniform1f(self.constant_attenuation_loc, self.constant_attenuation)
-        glUniform1f(self.linear_attenuation_loc, self.linear_attenuation)
-        glUniform1f(self.quadratic_attenuation_loc, self.quadratic_attenuation)
-        glUniform1f(self.specular_strength_loc, self.specular_strength)
\ No newline at end of file
+        Light.dirty_start = Light.max_lights
+        Light.dirty_end = 0
@@ -8,7 +8,18 @@
 #   use in the shaders.
 #==============================
 
+import os
 import sys
+import time
+import argparse
+
+# headless runs render without a window, through EGL (or OSMesa, if PYOPENGL_PLATFORM says so)
+#   PyOpenGL picks its platform when it is first imported, so this has to come before any import of it
+if '--headless' in sys.argv:
+    os.environ.setdefault('PYOPENGL_PLATFORM', 'egl')
+    # Mesa's EGL needs no display server at all on the surfaceless platform
+    os.environ.setdefault('EGL_PLATFORM', 'surfaceless')
+
 import copy
 import pygame
 from OpenGL.GL import *
@@ -19,8 +30,23 @@ from utils import *
 from rendered_object import RenderedObject
 from cube import Cube
 from cylinder import Cylinder
+from model import Model
 from light import Light
 from material import Material
+from gl_state import GLState
+from shader_program import ShaderProgram
+from scene_graph import SceneGraph
+from culling import FrustumCuller
+from bvh import SceneBVH
+from headless import HeadlessContext
+from frame_capture import FrameCapture
+from profiler import Profiler
+from normal_overlay import NormalOverlay
+from level_of_detail import LevelOfDetail
+from frame_pacer import FramePacer
+from transform_store import TransformStore
+from geometry_arena import GeometryArena
+from vertex_format import formats
 
 camera_angle = 60.0
 camera_start_position = Point(0.0, 0.0, 8.0)
@@ -62,59 +88,174 @@ single_color = np.array([
     1.0, 0.0, 1.0, 1.0, # right, top, back
 ], dtype='float32')
 
+def parse_arguments():
+    parser = argparse.ArgumentParser(description=name)
+    parser.add_argument('--headless', action='store_true', help='render offscreen for a fixed number of frames, without a window')
+    parser.add_argument('--width', type=int, default=window_dimensions[0])
+    parser.add_argument('--height', type=int, default=window_dimensions[1])
+    parser.add_argument('--frames', type=int, default=300, help='number of frames to render in headless mode')
+    parser.add_argument('--output', help='image file to save the last headless frame to')
+    parser.add_argument('--capture', metavar='DIRECTORY', help='save every frame into this directory')
+    parser.add_argument('--capture-format', default='png', choices=('png', 'jpg'))
+    parser.add_argument('--profile', action='store_true', help='time each pass on the CPU and GPU, and print percentiles on exit')
+    parser.add_argument('--profile-output', metavar='FILE', help='also write every timing to this file as JSON lines')
+    parser.add_argument('--model', metavar='FILE', help='an OBJ or PLY file to add to the scene, below the cubes')
+    parser.add_argument('--vertex-format', default='compact', choices=formats, help='float stores every vertex attribute as 32-bit floats, compact packs colors and normals, and half also uses half-float positions')
+    parser.add_argument('--pacing', default='target', choices=FramePacer.modes, help='how frames are paced in the window')
+    parser.add_argument('--fps', type=float, default=60, help='frame rate to pace to, with --pacing target')
+    parser.add_argument('--tick-rate', type=float, default=60, help='simulation steps per second')
+    parser.add_argument('--frame-budget', type=float, metavar='MS', help='time each frame should take, before drawing is scaled back (one frame at --fps by default)')
+    return parser.parse_args()
+
 def main():
-    # Create the initial window
-    init()
+    arguments = parse_arguments()
+    global window_dimensions
+    window_dimensions = (arguments.width, arguments.height)
+    GeometryArena.vertex_format = formats[arguments.vertex_format]
+
+    # Create the initial window (or the offscreen framebuffer)
+    init(arguments.headless, vsync=arguments.pacing == 'vsync', model_path=arguments.model)
 
     # camera configuration
     global camera 
     camera = Camera(camera_angle, window_dimensions[0]/window_dimensions[1])
     camera.eye = copy.deepcopy(camera_start_position)
     # camera.eye = Point(0, 0, 0)
-    camera.set_projection()
     # camera.place_camera()
-    camera.update_view_matrix()
     
+    # frames are read back and saved in the background while the next ones are drawn
+    global frame_capture
+    frame_capture = None
+    if arguments.capture is not None:
+        frame_capture = FrameCapture(*window_dimensions, arguments.capture, arguments.capture_format)
+
+    if arguments.profile or arguments.profile_output is not None:
+        Profiler.start(arguments.profile_output)
+
     # Listens for events and draws the scene
-    main_loop()
+    if arguments.headless:
+        run_headless(arguments.frames, arguments.output)
+    else:
+        frame_budget = None if arguments.frame_budget is None else arguments.frame_budget / 1000
+        frame_pacer = FramePacer(arguments.pacing, arguments.fps, arguments.tick_rate, frame_budget)
+        main_loop(frame_pacer)
+        print(f'frame pacing: {frame_pacer.report()}')
+
+    if frame_capture is not None:
+        frame_capture.close()
+        print(frame_capture.report())
+
+    if Profiler.enabled:
+        Profiler.stop()
+        print(Profiler.report())
+
+    # how many redundant OpenGL calls the state cache skipped
+    print(GLState.report())
+    # how much of the scene was left out of the last frame
+    print(f'culling: {culler.report()}')
+    print(f'level of detail: {level_of_detail.report()}')
+    # how the last frame's draws were batched, and how much memory the geometry takes
+    print(f'render queue: {RenderedObject.render_queue.report()}')
+    print(f'geometry: {GeometryArena.get_instance().report()}')
     return
 
-def main_loop():
-    global running, clock
+def main_loop(frame_pacer):
+    global running
+    transform_store = TransformStore.get_instance()
     while running:
         # poll for events
         # pygame.QUIT event means the user clicked X to close your window
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            elif event.type == pygame.KEYDOWN:
-                keyboard(event)
-
-        # advance frame (for animations, objects, other stuff being tracked)
-        advance()
-
-        # (Re)draw the scene
-        display()
-
-        # Flipping causes the current image to be seen. (Double-Buffering)
-        pygame.display.flip()
-
-        clock.tick(60)  # limits FPS to 60
+        with Profiler.scope('events', gpu=False):
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN:
+                    keyboard(event)
+
+        # advance the simulation (for animations, objects, other stuff being tracked)
+        #   in fixed steps, as many as fit in the time since the last frame
+        with Profiler.scope('advance', gpu=False):
+            for _ in range(frame_pacer.begin_frame()):
+                transform_store.save_previous()
+                advance()
+
+        # (Re)draw the scene, unless the last frame ran so long this one is skipped to catch up
+        if frame_pacer.should_render():
+            with Profiler.scope('display'):
+                # drawn part of the way between the last two steps, since frames and steps rarely line up
+                transform_store.interpolate(frame_pacer.alpha)
+                display(frame_pacer.degraded)
+                transform_store.restore()
+            if frame_capture is not None:
+                with Profiler.scope('capture'):
+                    frame_capture.capture()
+
+            # Flipping causes the current image to be seen. (Double-Buffering)
+            #   (with vsync, this is also what waits for the next frame)
+            with Profiler.scope('present', gpu=False):
+                frame_pacer.present()
+                pygame.display.flip()
+
+        # waits for the next frame when pacing to a target frame rate
+        frame_pacer.end_frame()
+        Profiler.end_frame()
+
+# Draws a fixed number of frames into the offscreen framebuffer, and reports how long they took
+#   each frame waits for OpenGL to finish, so the times include the rendering itself
+#   every frame runs exactly one simulation step, so the output is the same however fast it renders
+def run_headless(frame_count, output=None):
+    frame_times = np.empty(frame_count)
+    start_time = time.perf_counter()
+    for frame in range(frame_count):
+        frame_start_time = time.perf_counter()
+        with Profiler.scope('advance', gpu=False):
+            advance()
+        with Profiler.scope('display'):
+            display()
+        if frame_capture is not None:
+            with Profiler.scope('capture'):
+                frame_capture.capture()
+        glFinish()
+        frame_times[frame] = time.perf_counter() - frame_start_time
+        Profiler.end_frame()
+    total_time = time.perf_counter() - start_time
+
+    frame_times *= 1000
+    print(f'{frame_count} frames at {window_dimensions[0]}x{window_dimensions[1]} in {total_time:.3f}s ({frame_count / total_time:.1f} fps)')
+    if frame_count:
+        print(f'frame times (ms): mean {frame_times.mean():.3f}, median {np.median(frame_times):.3f}, '
+              f'95th percentile {np.percentile(frame_times, 95):.3f}, min {frame_times.min():.3f}, max {frame_times.max():.3f}')
+
+    if output is not None:
+        from PIL import Image
+        Image.fromarray(headless_context.read_pixels()[:, :, :3]).save(output)
 
 # Initialize some of the OpenGL matrices
-def init():
-    global clock, running
- 
-    # pygame setup
-    pygame.init()
-    # configures held inputs to repeat for the first time after 300ms, and then every 50ms afterwards
-    #   action -> 300ms -> action -> 50ms -> action -> 50ms -> action ...
-    pygame.key.set_repeat(300, 50)
-    screen = pygame.display.set_mode(window_dimensions, pygame.DOUBLEBUF|pygame.OPENGL)
-    pygame.display.set_caption(name)
-    clock = pygame.time.Clock()
+def init(headless=False, vsync=False, model_path=None):
+    global running, headless_context
+
+    if headless:
+        # an offscreen framebuffer stands in for the window, so no display is needed
+        headless_context = HeadlessContext(*window_dimensions)
+    else:
+        # pygame setup
+        pygame.init()
+        # configures held inputs to repeat for the first time after 300ms, and then every 50ms afterwards
+        #   action -> 300ms -> action -> 50ms -> action -> 50ms -> action ...
+        pygame.key.set_repeat(300, 50)
+        try:
+            pygame.display.set_mode(window_dimensions, pygame.DOUBLEBUF|pygame.OPENGL, vsync=int(vsync))
+        except pygame.error:
+            # not every driver lets vsync be turned on, in which case frames are just left unpaced
+            print('vsync is not supported here, frames will not be paced')
+            pygame.display.set_mode(window_dimensions, pygame.DOUBLEBUF|pygame.OPENGL)
+        pygame.display.set_caption(name)
     running = True
 
+    # a new context starts with nothing bound, so nothing cached about an earlier one still holds
+    #   (buffer ids are handed out again from 1, so a stale binding would match the first new buffer)
+    GLState.reset()
+
     # extra sanity checks
     version = glGetString(GL_VERSION).decode()
     print(f'OpenGL Version: {version}')
@@ -123,47 +264,6 @@ def init():
     global global_rotation
     global_rotation = 0
 
-    # configure shaders
-    vertex_shader_source = ''
-    with open('shader.vert', 'r') as file:
-        vertex_shader_source = file.readlines()
-
-    fragment_shader_source = ''
-    with open('shader.frag', 'r') as file:
-        fragment_shader_source = file.readlines()
-
-    # main shader program
-    global main_program
-    main_program = glCreateProgram()
-
-    vertex_shader = glCreateShader(GL_VERTEX_SHADER)
-    glShaderSource(vertex_shader, vertex_shader_source)
-    glCompileShader(vertex_shader)
-    glAttachShader(main_program, vertex_shader)
-
-    fragment_shader = glCreateShader(GL_FRAGMENT_SHADER)
-    glShaderSource(fragment_shader, fragment_shader_source)
-    glCompileShader(fragment_shader)
-    glAttachShader(main_program, fragment_shader)
-
-    glLinkProgram(main_program)
-
-    print(f'Main Program log: {glGetProgramInfoLog(main_program)}')
-    print(f'Vertex Shader log: {glGetShaderInfoLog(vertex_shader)}')
-    print(f'Fragment Shader log: {glGetShaderInfoLog(fragment_shader)}')
-
-    glUseProgram(main_program) # NOTE: this line will fail if shaders do not compile
-
-    # uniforms
-    global proj_loc, modelview_loc
-
-    proj_loc = glGetUniformLocation(main_program, 'projectionMatrix')
-    modelview_loc = glGetUniformLocation(main_program, 'modelviewMatrix')
-
-    # pass uniform locations to rendered object parent class
-    RenderedObject.proj_loc = proj_loc
-    RenderedObject.modelview_loc = modelview_loc
-
     # uniforms for lighting
     # light0_enabled = glGetUniformLocation(main_program, 'lights[0].isEnabled')
     # light0_ambient = glGetUniformLocation(main_program, 'lights[0].ambient')
@@ -177,12 +277,9 @@ def init():
 
     # uniforms for lighting (handled by class)
     global light_0
-    light_0 = Light(0, main_program, ambient=(0.2, 0.2, 0.2), position=(30.0, 0.0, 0.0), is_local=True)
+    light_0 = Light(0, ambient=(0.2, 0.2, 0.2), position=(30.0, 0.0, 0.0), is_local=True)
     # TODO: add a place light function to move the light
-    # light_1 = Light(1, main_program, color=(0.0, 0.0, 1.0), ambient=(0.2, 0.2, 0.2), position=(0.0, 0.0, 3.0))
-
-    eyeDirection_loc = glGetUniformLocation(main_program, 'eyeDirection')
-    glUniform3f(eyeDirection_loc, 0.0, 0.0, -1.0)
+    # light_1 = Light(1, color=(0.0, 0.0, 1.0), ambient=(0.2, 0.2, 0.2), position=(0.0, 0.0, 3.0))
 
     # uniforms for materials
     # mat0_ambient = glGetUniformLocation(main_program, 'materials[0].ambient')
@@ -191,74 +288,41 @@ def init():
     # glUniform3f(mat0_diffuse, 1.0, 1.0, 1.0)
 
     # uniforms for materials (handled by class)
-    material_0 = Material(0, main_program, shininess=100)
+    material_0 = Material(0, shininess=100)
 
-    # adding secondary debug program for viewing normals
     # configure shaders
-    vertex_shader_source = ''
-    with open('normal_shader.vert', 'r') as file:
-        vertex_shader_source = file.readlines()
+    #   each program is compiled once, and loaded from the binary cache on later launches
+    #   the main program is specialized for the lights, so it is chosen once they exist
+    use_main_program()
 
-    fragment_shader_source = ''
-    with open('normal_shader.frag', 'r') as file:
-        fragment_shader_source = file.readlines()
-
-    geometry_shader_source = ''
-    with open('normal_shader.geom', 'r') as file:
-        geometry_shader_source = file.readlines()
-
-    # secondary debug shader program
-    global normal_view_program
-    normal_view_program = glCreateProgram()
-
-    vertex_shader = glCreateShader(GL_VERTEX_SHADER)
-    glShaderSource(vertex_shader, vertex_shader_source)
-    glCompileShader(vertex_shader)
-    glAttachShader(normal_view_program, vertex_shader)
-
-    geometry_shader = glCreateShader(GL_GEOMETRY_SHADER)
-    glShaderSource(geometry_shader, geometry_shader_source)
-    glCompileShader(geometry_shader)
-    glAttachShader(normal_view_program, geometry_shader)
-
-    fragment_shader = glCreateShader(GL_FRAGMENT_SHADER)
-    glShaderSource(fragment_shader, fragment_shader_source)
-    glCompileShader(fragment_shader)
-    glAttachShader(normal_view_program, fragment_shader)
-
-    glLinkProgram(normal_view_program)
-
-    print(f'Normal Program log: {glGetProgramInfoLog(normal_view_program)}')
-    print(f'Vertex Shader log: {glGetShaderInfoLog(vertex_shader)}')
-    print(f'Geometry Shader log: {glGetShaderInfoLog(geometry_shader)}')
-    print(f'Fragment Shader log: {glGetShaderInfoLog(fragment_shader)}')
-
-    glUseProgram(normal_view_program) # NOTE: this line will fail if shaders do not compile
-
-    # uniforms
-    global normal_proj_loc, normal_modelview_loc
-
-    normal_proj_loc = glGetUniformLocation(normal_view_program, 'projectionMatrix')
-    normal_modelview_loc = glGetUniformLocation(normal_view_program, 'modelviewMatrix')
-
-    # pass uniform locations to rendered object parent class
-    RenderedObject.normal_proj_loc = normal_proj_loc
-    RenderedObject.normal_modelview_loc = normal_modelview_loc
+    # adding secondary debug program for viewing normals
+    ShaderProgram.get('normal_shader.vert', 'normal_shader.frag')
+    print(f'Shader programs: {ShaderProgram.report()}')
 
     # construct cubes
-    global original_cube, new_cube, single_color_cube
-    original_cube = Cube(single_color)
-    new_cube = Cube(single_color)
-    single_color_cube = Cube(single_color)
+    # every object lives in the scene graph, so it can be looked up by name
+    #   and parented to any other object
+    global scene, culler, level_of_detail
+    scene = SceneGraph()
+    culler = FrustumCuller()
+    level_of_detail = LevelOfDetail()
+    scene.add(Cube(single_color), 'original_cube')
+    scene.add(Cube(single_color), 'new_cube')
+    scene.add(Cube(single_color), 'single_color_cube')
+    scene.find('single_color_cube').rendered_object.show_normals = True
 
     # construct cylinder
-    # global cylinder
-    # cylinder = Cylinder(6, 2)
+    # scene.add(Cylinder(6, 2), 'cylinder')
+
+    # and the model loaded from a file, if there is one
+    if model_path is not None:
+        scene.add(Model(model_path), 'model')
 
-    # enable primitive restart 
+    # enable primitive restart
     #   necessary for objects with multiple geometries in one VAO
-    glEnable(GL_PRIMITIVE_RESTART)
-    glPrimitiveRestartIndex(0xFFFF)
+    #   the restart index is the largest value of whichever index type is drawn,
+    #   so 0xFFFF for 16-bit indices and 0xFFFFFFFF for 32-bit indices
+    glEnable(GL_PRIMITIVE_RESTART_FIXED_INDEX)
 
     # use depth test to only accept fragment if it is closer to the camera
     glEnable(GL_DEPTH_TEST)
@@ -267,77 +331,100 @@ def init():
     # set object transforms (model matrices)
     position_objects()
 
+    # bounding volume hierarchy over the scene, for culling and picking
+    #   (needs to be remade whenever objects are added to or removed from the scene)
+    global scene_bvh
+    scene_bvh = SceneBVH(scene.rendered_objects())
+
+# switches to the main program specialized for the current lights
+#   a variant is compiled the first time its combination of lights is used,
+#   so changing the lights back and forth does not recompile anything
+def use_main_program():
+    global main_program
+    shader = ShaderProgram.get('shader.vert', 'shader.frag', defines=Light.shader_defines())
+    main_program = shader.program
+    GLState.use_program(main_program)
+
+    # each variant has its own uniform locations (and values)
+    RenderedObject.shader = shader
+    GLState.uniform3f(shader.uniform_location('eyeDirection'), 0.0, 0.0, -1.0)
+
 def position_objects():
-    # TODO: determine why objects are moving away from one another
-    new_cube.translate(2, 0, 0)
-    single_color_cube.translate(-2, 0, 0)
+    scene.find('new_cube').rendered_object.translate(2, 0, 0)
+    scene.find('single_color_cube').rendered_object.translate(-2, 0, 0)
+
+    scene.find('original_cube').rendered_object.translate(0, 0, -10)
 
-    original_cube.translate(0, 0, -10)
-    # original_cube.rotate_around_y(30)
+    # the model is centered below the cubes, and scaled to fit in a sphere of radius 1.5
+    if 'model' in scene.nodes_by_name:
+        model = scene.find('model').rendered_object
+        size = 1.5 / max(model.mesh.bounding_radius, 1e-6)
+        model.translate(0, -3, 0)
+        model.scale(size, size, size)
+        model.translate(*-model.mesh.bounding_center)
+    # scene.find('original_cube').rendered_object.rotate_around_y(30)
 
 
 # Callback function used to display the scene
-def display():
+#   degraded frames leave out the extras (like the normals) to get back within the frame budget
+def display(degraded=False):
     glClearColor(0.0, 0.0, 0.0, 0.0)
     glClear(GL_COLOR_BUFFER_BIT)
     glClear(GL_DEPTH_BUFFER_BIT)
 
     # place camera
-    # NOTE: placing the camera resets all matrices to identity
-    camera.set_projection()
-    # camera.place_camera()
-    camera.update_view_matrix()
-
+    # NOTE: the camera matrices are only recomputed when the camera has changed
+    #   since they were last used
 
     # LIGHT POSITION UPDATE
     # TODO: need to make lights have the same transformation abilities as rendered objects
-    glUseProgram(main_program)
+    with Profiler.scope('uploads'):
+        Light.update_all(camera)
+        Material.update_all()
 
-    # cube 1
-    # glTranslatef(-3.0, 0.0, 0.0)
-    # glRotatef(global_rotation, 0.0, 0.0, 1.0)
-    original_cube.draw_object()
+        use_main_program()
 
-    # # transform cube (please work!)
-    # original_cube.translate(1, 0, 0) # does same thing as holding a (left)
+    with Profiler.scope('transforms', gpu=False):
+        # recompute the world matrices of anything that moved (and anything attached to it)
+        scene.update()
 
-    # glRotatef(global_rotation, 0.0, 0.0, 1.0)
-    # glRotatef(global_rotation, 0.0, 1.0, 0.0)
-    single_color_cube.draw_object()
-    glUseProgram(normal_view_program)
-    single_color_cube.draw_normals()
-    
-    # cube 2
-    # glRotatef(-global_rotation, 0.0, 0.0, 1.0)
-    # glTranslatef(6.0, 0.0, 0.0)
-    # glRotatef(global_rotation, 0.0, 0.0, 1.0)
-    glUseProgram(main_program)
-    new_cube.rotate_around_y(1)
-    new_cube.draw_object()
-
-    # return to zero (not necessary)
-    # glRotatef(-global_rotation, 0.0, 0.0, 1.0)
-    # glTranslatef(-3.0, 0.0, 0.0)
+    # anything outside the camera's view is skipped before it reaches the GPU
+    with Profiler.scope('culling', gpu=False):
+        visible_objects = culler.cull_hierarchy(scene_bvh, camera)
+
+    # and whatever is small on screen is drawn with fewer triangles
+    with Profiler.scope('level_of_detail', gpu=False):
+        level_of_detail.select(visible_objects, camera)
+
+    # every cube shares one mesh, so they all go out in a single instanced draw call
+    RenderedObject.draw_objects(visible_objects)
+
+    # debug view of the normals, of whichever visible objects have them turned on
+    if not degraded:
+        NormalOverlay.draw(visible_objects)
 
     # cylinder
     # glTranslatef(0.0, -1.0, 0.0)
     # glScalef(1.0, 2.0, 1.0)
     # glRotatef(90.0, -1.0, 0.0, 0.0)
-    # cylinder.draw_object()
+    # (drawn along with the cubes once it is added to the scene)
 
     glFlush()
 
-# Advance the scene one frame
+# Advance the scene one simulation step
 def advance():
     # rotate world by increasing angle
     global global_rotation
     global_rotation += 1.0
     global_rotation %= 360
 
+    # animate cube 2
+    scene.find('new_cube').rendered_object.rotate_around_y(1)
+
 # Function used to handle any key events
 # event: The keyboard event that happened
 def keyboard(event):
-    global running, camera
+    global running
 
     key = event.key # "ASCII" value of the key pressed
     if key == 27:  # ASCII code 27 = ESC-key
@@ -345,14 +432,29 @@ def keyboard(event):
     elif key == ord('r'):
         # Reset the camera position
         camera.eye = copy.deepcopy(camera_start_position)
-        # camera.place_camera()
-        camera.update_view_matrix()
+    elif key == ord('c'):
+        # Toggle frustum culling, and show how much it culled
+        culler.enabled = not culler.enabled
+        print(f'culling {"enabled" if culler.enabled else "disabled"}: {culler.report()}')
+    elif key == ord('i'):
+        # Show the timings so far (when profiling)
+        print(Profiler.report())
+    elif key == ord('n'):
+        # Toggle the normals overlay
+        print(f'normals {"shown" if NormalOverlay.toggle() else "hidden"}')
+    elif key == ord('l'):
+        # Toggle levels of detail, and show how many triangles they saved
+        level_of_detail.enabled = not level_of_detail.enabled
+        print(f'levels of detail {"enabled" if level_of_detail.enabled else "disabled"}: {level_of_detail.report()}')
+    elif key == ord('p'):
+        # Pick the object the camera is looking at
+        picked, distance = scene_bvh.pick(camera)
+        names = [node.name for node in scene.root.walk() if picked is not None and node.rendered_object is picked]
+        print(f'picked {names[0] if names else picked} at distance {distance:.2f}')
     elif key == ord('t'):
         # Reset the camera angles
         camera.yaw_angle = 0
         camera.pitch_angle = 0
-        # camera.place_camera()
-        camera.update_view_matrix()
     elif key == ord('w'):
         # Go forward
         camera.slide(0,0,-1)
@@ -1,31 +1,98 @@
+import numpy as np
 from OpenGL.GL import *
+from gl_state import GLState
 
 class Material:
+    all_materials = []
+
+    # must match the MaterialBlock binding in shader.frag
+    binding = 1
+
+    # std430 layout of MaterialProperties in shader.frag
+    #   each vec3 is aligned to 16 bytes, so the shininess fills the last 4 bytes of the emission
+    dtype = np.dtype({
+        'names': ['emission', 'shininess', 'ambient', 'diffuse', 'specular'],
+        'formats': [('float32', 3), 'float32', ('float32', 3), ('float32', 3), ('float32', 3)],
+        'offsets': [0, 12, 16, 32, 48],
+        'itemsize': 64,
+    })
+
+    # which field of the storage buffer each attribute is mirrored into
+    fields = {
+        'emission': 'emission',
+        'ambient': 'ambient',
+        'diffuse': 'diffuse',
+        'specular': 'specular',
+        'shininess': 'shininess',
+    }
+
+    # packed copy of the material table, and the range of materials changed since the last upload
+    #   the table grows as materials are added, so there is no fixed limit on how many exist
+    buffer_data = np.zeros(0, dtype=dtype)
+    ssbo = None
+    ssbo_capacity = 0
+    dirty_start = 0
+    dirty_end = 0
+
     # TODO: implement in a more strategic manner
-    def __init__(self, index, program, emission=(0.0, 0.0, 0.0), ambient=(1.0, 1.0, 1.0), diffuse=(1.0, 1.0, 1.0), specular=(1.0, 1.0, 1.0), shininess=0):
+    def __init__(self, index, program=None, emission=(0.0, 0.0, 0.0), ambient=(1.0, 1.0, 1.0), diffuse=(1.0, 1.0, 1.0), specular=(1.0, 1.0, 1.0), shininess=0):
         self.index = index
         self.program = program
-        
+        Material.reserve(index + 1)
+
         # load in the values, store in object memory
+        #   each assignment is also written into the packed table (see __setattr__)
         self.emission = emission
         self.ambient = ambient
         self.diffuse = diffuse
         self.specular = specular
         self.shininess = shininess
 
-        # retrieve the uniform locations
-        self.emission_loc = glGetUniformLocation(self.program, f'materials[{index}].emission')
-        self.ambient_loc = glGetUniformLocation(self.program, f'materials[{index}].ambient')
-        self.diffuse_loc = glGetUniformLocation(self.program, f'materials[{index}].diffuse')
-        self.specular_loc = glGetUniformLocation(self.program, f'materials[{index}].specular')
-        self.shininess_loc = glGetUniformLocation(self.program, f'materials[{index}].shininess')
-
-        # assign initial values
-        self.assign_uniform_values()
-
-    def assign_uniform_values(self):
-        glUniform3f(self.emission_loc, *self.emission)
-        glUniform3f(self.ambient_loc, *self.ambient)
-        glUniform3f(self.diffuse_loc, *self.diffuse)
-        glUniform3f(self.specular_loc, *self.specular)
-        glUniform1f(self.shininess_loc, self.shininess)
\ No newline at end of file
+        # add material to all materials list
+        Material.all_materials.append(self)
+
+    # keeps the packed table in sync with the material's attributes
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in Material.fields:
+            Material.buffer_data[Material.fields[name]][self.index] = value
+            Material.mark_dirty(self.index, self.index + 1)
+
+    @staticmethod
+    def mark_dirty(start, end):
+        if Material.dirty_start >= Material.dirty_end:
+            Material.dirty_start, Material.dirty_end = start, end
+        else:
+            Material.dirty_start = min(Material.dirty_start, start)
+            Material.dirty_end = max(Material.dirty_end, end)
+
+    # makes room in the packed table for at least count materials
+    @staticmethod
+    def reserve(count):
+        if count > len(Material.buffer_data):
+            buffer_data = np.zeros(1 << (count - 1).bit_length(), dtype=Material.dtype)
+            buffer_data[:len(Material.buffer_data)] = Material.buffer_data
+            Material.buffer_data = buffer_data
+
+    # brings the storage buffer up to date, should be called once per frame
+    #   only the range of materials that changed is uploaded, unless the table outgrew the buffer
+    @staticmethod
+    def update_all():
+        if Material.ssbo is None:
+            Material.ssbo = glGenBuffers(1)
+
+        if Material.ssbo_capacity < len(Material.buffer_data):
+            # reallocate the buffer with the whole table in it, and attach it to the block's binding point
+            GLState.bind_buffer(GL_SHADER_STORAGE_BUFFER, Material.ssbo)
+            glBufferData(GL_SHADER_STORAGE_BUFFER, Material.buffer_data.nbytes, Material.buffer_data, GL_DYNAMIC_DRAW)
+            GLState.bind_buffer_base(GL_SHADER_STORAGE_BUFFER, Material.binding, Material.ssbo)
+            Material.ssbo_capacity = len(Material.buffer_data)
+        elif Material.dirty_start < Material.dirty_end:
+            dirty_data = Material.buffer_data[Material.dirty_start:Material.dirty_end]
+            GLState.bind_buffer(GL_SHADER_STORAGE_BUFFER, Material.ssbo)
+            glBufferSubData(GL_SHADER_STORAGE_BUFFER, Material.dirty_start * Material.dtype.itemsize, dirty_data.nbytes, dirty_data)
+        else:
+            return
+
+        Material.dirty_start = 0
+        Material.dirty_end = 0
@@ -0,0 +1,110 @@
+import ctypes
+import numpy as np
+from OpenGL.GL import *
+from gl_state import GLState
+
+class Mesh:
+    # every mesh created so far, keyed by a description of its geometry
+    #   e.g. 'cube' or ('cylinder', slices, stacks)
+    registry = {}
+
+    # layout of the per-instance buffer, one record for every object drawn
+    #   the model matrix is read as four vec4 columns (locations 4-7), the color as location 3,
+    #   the index into the material table as location 8 and the normal matrix as three vec3 columns (locations 9-11)
+    instance_dtype = np.dtype([('model_matrix', 'float32', (4, 4)), ('color', 'float32', 4), ('material_index', 'uint32'), ('normal_matrix', 'float32', (3, 3))])
+
+    # fetches the mesh registered under key, calling build() to create the
+    #   vertex data (as keyword arguments for Mesh) the first time it is requested
+    @staticmethod
+    def get(key, build):
+        mesh = Mesh.registry.get(key)
+        if mesh is None:
+            mesh = Mesh(**build())
+            Mesh.registry[key] = mesh
+        return mesh
+
+    # the geometry is kept here, and copied into the shared buffers of the geometry arena
+    #   (see geometry_arena.py) the first time the mesh is drawn
+    def __init__(self, vertices, normals, indices, colors=None, mode=GL_TRIANGLE_STRIP):
+        # meshes without their own colors are drawn white, so only the instance color shows
+        if colors is None:
+            colors = np.ones(len(vertices) // 3 * 4, dtype='float32')
+
+        self.vertices = vertices
+        self.normals = normals
+        self.colors = colors
+        self.indices = indices
+        self.mode = mode
+        self.num_indices = len(indices)
+        self.triangle_count = Mesh.count_triangles(indices, mode)
+
+        # bounding volumes in the mesh's own space, used for culling
+        #   the sphere is centered on the box, so it is tight around it
+        positions = np.reshape(vertices, (-1, 3))
+        self.aabb_min = positions.min(axis=0)
+        self.aabb_max = positions.max(axis=0)
+        self.bounding_center = (self.aabb_min + self.aabb_max) / 2
+        self.bounding_radius = np.linalg.norm(positions - self.bounding_center, axis=1).max()
+
+    # how many triangles the indices make
+    @staticmethod
+    def count_triangles(indices, mode):
+        if mode == GL_TRIANGLES:
+            return len(indices) // 3
+        # each strip (between restart indices) of n indices makes n - 2 triangles
+        indices = np.asarray(indices)
+        restarts = np.flatnonzero(indices == np.iinfo(indices.dtype).max)
+        lengths = np.diff(np.concatenate(([-1], restarts, [len(indices)]))) - 1
+        return int(np.maximum(lengths - 2, 0).sum())
+
+    # points the per-instance attributes of the bound vertex array at the bound array buffer,
+    #   laid out as instance_dtype
+    @staticmethod
+    def set_instance_attributes():
+        stride = Mesh.instance_dtype.itemsize
+        # set the pointers for the four columns of the model matrix
+        #   a divisor of 1 advances the attribute once per instance instead of once per vertex
+        for column in range(4):
+            glVertexAttribPointer(4 + column, 4, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(Mesh.instance_dtype.fields['model_matrix'][1] + column * 16))
+            glVertexAttribDivisor(4 + column, 1)
+            glEnableVertexAttribArray(4 + column)
+        # set the pointer for the instance color
+        glVertexAttribPointer(3, 4, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(Mesh.instance_dtype.fields['color'][1]))
+        glVertexAttribDivisor(3, 1)
+        glEnableVertexAttribArray(3)
+        # set the pointer for the material index
+        #   the I variant keeps it an integer instead of converting it to a float
+        glVertexAttribIPointer(8, 1, GL_UNSIGNED_INT, stride, ctypes.c_void_p(Mesh.instance_dtype.fields['material_index'][1]))
+        glVertexAttribDivisor(8, 1)
+        glEnableVertexAttribArray(8)
+        # set the pointers for the three columns of the normal matrix
+        for column in range(3):
+            glVertexAttribPointer(9 + column, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(Mesh.instance_dtype.fields['normal_matrix'][1] + column * 12))
+            glVertexAttribDivisor(9 + column, 1)
+            glEnableVertexAttribArray(9 + column)
+
+    # the per-instance records of the objects
+    #   the world matrices are gathered straight out of the transform store
+    #   (which must be up to date) instead of being built one object at a time
+    @staticmethod
+    def pack_instances(objects):
+        transform_store = objects[0].transform_store
+        transform_indices = [rendered_object.transform_index for rendered_object in objects]
+        instances = np.empty(len(objects), dtype=Mesh.instance_dtype)
+        instances['model_matrix'] = transform_store.world_matrices[transform_indices]
+        instances['color'] = [rendered_object.color for rendered_object in objects]
+        instances['material_index'] = [rendered_object.material_index for rendered_object in objects]
+        instances['normal_matrix'] = transform_store.normal_matrices[transform_indices]
+        return instances
+
+    # copies instance records into an instance buffer with room for capacity of them,
+    #   returning its new capacity
+    #   the buffer grows to the next power of two when needed, so it is not reallocated every frame
+    @staticmethod
+    def upload_instances(instance_vbo, capacity, instances):
+        GLState.bind_buffer(GL_ARRAY_BUFFER, instance_vbo)
+        if len(instances) > capacity:
+            capacity = 1 << (len(instances) - 1).bit_length()
+            glBufferData(GL_ARRAY_BUFFER, capacity * Mesh.instance_dtype.itemsize, None, GL_STREAM_DRAW)
+        glBufferSubData(GL_ARRAY_BUFFER, 0, instances.nbytes, instances)
+        return capacity
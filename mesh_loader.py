@@ -0,0 +1,423 @@
+import os
+import numpy as np
+from OpenGL.GL import *
+
+# files are read this many bytes at a time, so only one chunk of the file is in memory at once
+#   (alongside the arrays already built from the chunks before it)
+chunk_size = 1 << 24
+
+# PLY property types, as numpy types
+ply_types = {
+    'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2', 'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8',
+}
+ply_byte_orders = {'binary_little_endian': '<', 'binary_big_endian': '>'}
+
+class LineReader:
+    # reads a text file in chunks of whole lines, so no line is split between two chunks
+    def __init__(self, file, chunk_size):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.pending = b''
+
+    # the next chunk of lines (no more than max_lines of them), or b'' at the end of the file
+    #   the last line always ends with a newline, even if the file's does not
+    def read(self, max_lines=None):
+        data = self.pending
+        if len(data) < self.chunk_size:
+            data += self.file.read(self.chunk_size)
+        end = data.rfind(b'\n') + 1
+        # a line longer than a chunk is read until it ends
+        while end == 0 and data:
+            more = self.file.read(self.chunk_size)
+            data += more if more else b'\n'
+            end = data.rfind(b'\n') + 1
+        if max_lines is not None:
+            newlines = np.flatnonzero(np.frombuffer(data, 'uint8', end) == ord('\n'))
+            if len(newlines) > max_lines:
+                end = int(newlines[max_lines - 1]) + 1
+        self.pending = data[end:]
+        return data[:end]
+
+# the numbers in a chunk of text, separated by any whitespace (newlines included)
+def parse_numbers(text, dtype):
+    return np.fromstring(text, dtype=dtype, sep=' ')
+
+# how many whitespace separated words are on each line of a chunk of whole lines (as bytes)
+def tokens_per_line(text):
+    space = text <= ord(' ')
+    word_starts = np.flatnonzero(~space & np.concatenate(([True], space[:-1])))
+    line_ends = np.flatnonzero(text == ord('\n'))
+    return np.diff(np.concatenate(([0], np.searchsorted(word_starts, line_ends))))
+
+# the text of some of the lines of a chunk (with the first skip bytes of each left out), as bytes
+#   the lines are picked with a mask over line_starts and line_ends, and keep their newlines
+def select_lines(text, line_starts, line_ends, selected, skip):
+    # +1 where a picked line starts and -1 after it ends, so the running sum marks the bytes in between
+    marks = np.zeros(len(text) + 1, dtype='int8')
+    marks[line_starts[selected] + skip] = 1
+    marks[line_ends[selected] + 1] = -1
+    return text[np.cumsum(marks[:-1], dtype='int8').astype(bool)]
+
+# the corners of the triangles that fan out from the first corner of each polygon,
+#   given how many corners each of the polygons (laid out one after another) has
+def fan_triangles(corner_counts):
+    firsts = np.cumsum(corner_counts) - corner_counts
+    triangle_counts = np.maximum(corner_counts - 2, 0)
+    polygons = np.repeat(np.arange(len(corner_counts)), triangle_counts)
+    steps = np.arange(len(polygons)) - np.repeat(np.cumsum(triangle_counts) - triangle_counts, triangle_counts)
+    first = firsts[polygons]
+    return np.stack((first, first + steps + 1, first + steps + 2), axis=1)
+
+# the same for polygons that all have as many corners, given as a 2D array of their vertex indices
+def fan_polygons(polygons):
+    corner_count = polygons.shape[1]
+    steps = np.arange(1, corner_count - 1)
+    firsts = np.repeat(polygons[:, :1], len(steps), axis=1)
+    return np.stack((firsts, polygons[:, steps], polygons[:, steps + 1]), axis=2).reshape(-1, 3)
+
+# area weighted normals at each vertex, from the triangles around it
+#   the triangles are taken a block at a time, so the corners of all of them are never copied out at once
+def smooth_normals(positions, triangles):
+    normals = np.zeros((len(positions), 3))
+    block_size = max(chunk_size // 64, 1)
+    for start in range(0, len(triangles), block_size):
+        block = triangles[start:start + block_size]
+        corners = positions[block]
+        face_normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+        for axis in range(3):
+            normals[:, axis] += np.bincount(block.reshape(-1), np.repeat(face_normals[:, axis], 3), len(positions))
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return (normals / np.where(lengths > 0, lengths, 1.0)).astype('float32')
+
+# the keyword arguments for a triangle Mesh, from (n, 3) positions (and normals and (n, 4) colors,
+#   if the file has them) and (n, 3) triangles of indices into them
+# vertices with the same value for every attribute are merged into one, and vertices that no
+#   triangle uses are left out; normals are worked out from the faces if the file has none
+def build_mesh(positions, triangles, normals=None, colors=None):
+    vertex_count = len(positions)
+    if len(triangles) == 0:
+        raise ValueError('the file has no faces')
+    if triangles.min() < 0 or triangles.max() >= vertex_count:
+        raise ValueError('a face uses a vertex that is not in the file')
+
+    attributes = np.concatenate([positions] + [values for values in (normals, colors) if values is not None], axis=1).astype('float32')
+    used = np.zeros(vertex_count, dtype=bool)
+    used[triangles] = True
+    kept = np.flatnonzero(used)
+    attributes, merged = np.unique(attributes[kept], axis=0, return_inverse=True)
+    remap = np.zeros(vertex_count, dtype='int64')
+    remap[kept] = merged.reshape(-1)
+    triangles = remap[triangles]
+
+    positions = attributes[:, :3]
+    if normals is None:
+        normals = smooth_normals(positions, triangles)
+    else:
+        normals = attributes[:, 3:6]
+    mesh = {
+        'vertices': np.ascontiguousarray(positions).reshape(-1),
+        'normals': np.ascontiguousarray(normals, dtype='float32').reshape(-1),
+        'indices': triangles.astype('uint32').reshape(-1),
+        'mode': GL_TRIANGLES,
+    }
+    if colors is not None:
+        mesh['colors'] = np.ascontiguousarray(attributes[:, -4:]).reshape(-1)
+    return mesh
+
+# rgb(a) colors as (n, 4) floats from 0 to 1, from byte or float color components
+def to_colors(components):
+    colors = np.ones((len(components), 4), dtype='float32')
+    colors[:, :components.shape[1]] = components
+    if np.issubdtype(components.dtype, np.integer):
+        colors[:, :components.shape[1]] /= 255.0
+    return colors
+
+# reads an OBJ file into the keyword arguments for a Mesh
+#   positions (v, with an optional rgb color after them), normals (vn) and faces (f) are read,
+#   and everything else (texture coordinates, groups, materials) is skipped
+# each chunk is parsed as a whole: the lines of each kind are found by looking at the first bytes of
+#   every line at once, and the text of all of them is handed to numpy to turn into numbers in one go
+# faces can have any number of corners, which are split into triangles, and negative indices
+#   (counting back from the last vertex read) are resolved
+def load_obj(path):
+    position_chunks = []
+    normal_chunks = []
+    color_chunks = []
+    triangle_chunks = []
+    position_count = 0
+    normal_count = 0
+
+    with open(path, 'rb') as file:
+        reader = LineReader(file, chunk_size)
+        while True:
+            data = reader.read()
+            if not data:
+                break
+            text = np.frombuffer(data, dtype='uint8')
+            line_ends = np.flatnonzero(text == ord('\n'))
+            line_starts = np.concatenate(([0], line_ends[:-1] + 1))
+            # lines can be indented, so each one is looked at from its first byte that is not a space
+            #   (indented lines are moved along a byte at a time, and a blank line stops at its newline)
+            indented = np.flatnonzero((text[line_starts] == ord(' ')) | (text[line_starts] == ord('\t')))
+            while len(indented):
+                line_starts[indented] += 1
+                firsts = text[line_starts[indented]]
+                indented = indented[(firsts == ord(' ')) | (firsts == ord('\t'))]
+            # the first three bytes of every line (with zeros past the end of the chunk)
+            heads = np.concatenate((text, np.zeros(3, dtype='uint8')))[line_starts[:, np.newaxis] + np.arange(3)]
+            spaces = (heads == ord(' ')) | (heads == ord('\t'))
+            is_position = (heads[:, 0] == ord('v')) & spaces[:, 1]
+            is_normal = (heads[:, 0] == ord('v')) & (heads[:, 1] == ord('n')) & spaces[:, 2]
+            is_face = (heads[:, 0] == ord('f')) & spaces[:, 1]
+
+            if is_position.any():
+                lines = int(is_position.sum())
+                values = parse_numbers(select_lines(text, line_starts, line_ends, is_position, 1).tobytes(), 'float64')
+                if len(values) % lines or len(values) // lines < 3:
+                    raise ValueError(f'{path}: every vertex needs the same number of values, and at least 3')
+                values = values.reshape(lines, -1)
+                position_chunks.append(values[:, :3].astype('float32'))
+                color_chunks.append(to_colors(values[:, 3:6]) if values.shape[1] == 6 else None)
+
+            if is_normal.any():
+                values = parse_numbers(select_lines(text, line_starts, line_ends, is_normal, 2).tobytes(), 'float64')
+                if len(values) != 3 * is_normal.sum():
+                    raise ValueError(f'{path}: every normal needs 3 values')
+                normal_chunks.append(values.reshape(-1, 3).astype('float32'))
+
+            if is_face.any():
+                faces = select_lines(text, line_starts, line_ends, is_face, 1)
+                corner_counts = tokens_per_line(faces)
+                # corners are written as v, v/vt, v//vn or v/vt/vn, the same way all through the file
+                first_corner = faces[:64].tobytes().split()[0]
+                slashes = first_corner.count(b'/')
+                no_texture = b'//' in first_corner
+                columns = slashes + 1 - no_texture
+                # which of the numbers of a corner is its normal's index, if it has one
+                normal_column = None if slashes < 2 else 1 if no_texture else 2
+                faces[faces == ord('/')] = ord(' ')
+                corners = parse_numbers(faces.tobytes(), 'int64')
+                if len(corners) != columns * corner_counts.sum():
+                    raise ValueError(f'{path}: every face corner needs to be written as {first_corner.decode()} is')
+                corners = corners.reshape(-1, columns)
+
+                # negative indices count back from the last vertex before the face
+                positions_before = np.repeat(position_count + np.cumsum(is_position)[is_face], corner_counts)
+                position_indices = corners[:, 0]
+                position_indices = np.where(position_indices < 0, position_indices + positions_before, position_indices - 1)
+                triangles = fan_triangles(corner_counts)
+                if normal_column is None:
+                    triangle_chunks.append((position_indices[triangles], None))
+                else:
+                    normals_before = np.repeat(normal_count + np.cumsum(is_normal)[is_face], corner_counts)
+                    normal_indices = corners[:, normal_column]
+                    normal_indices = np.where(normal_indices < 0, normal_indices + normals_before, normal_indices - 1)
+                    triangle_chunks.append((position_indices[triangles], normal_indices[triangles]))
+
+            position_count += int(is_position.sum())
+            normal_count += int(is_normal.sum())
+
+    if not position_chunks or not triangle_chunks:
+        raise ValueError(f'{path}: the file has no faces')
+    positions = np.concatenate(position_chunks)
+    colors = None
+    if all(chunk is not None for chunk in color_chunks):
+        colors = np.concatenate(color_chunks)
+    position_triangles = np.concatenate([chunk[0] for chunk in triangle_chunks])
+    if not normal_chunks or any(chunk[1] is None for chunk in triangle_chunks):
+        return build_mesh(positions, position_triangles, colors=colors)
+
+    # a vertex is a pair of a position and a normal, so the same position gets a vertex for
+    #   every normal it is used with
+    normals = np.concatenate(normal_chunks)
+    normal_triangles = np.concatenate([chunk[1] for chunk in triangle_chunks])
+    if position_triangles.min() < 0 or position_triangles.max() >= len(positions) or normal_triangles.min() < 0 or normal_triangles.max() >= len(normals):
+        raise ValueError(f'{path}: a face uses a vertex that is not in the file')
+    pairs, triangles = np.unique(position_triangles * len(normals) + normal_triangles, return_inverse=True)
+    position_indices = pairs // len(normals)
+    return build_mesh(positions[position_indices], triangles.reshape(-1, 3), normals[pairs % len(normals)],
+                      None if colors is None else colors[position_indices])
+
+# the format and elements of a PLY file, leaving the file at the start of its data
+#   each element is (name, count, properties), and each property (name, type), with the type
+#   of a list being a pair of the types of its length and of its values
+def read_ply_header(file):
+    if file.readline().strip() != b'ply':
+        raise ValueError('not a PLY file')
+    file_format = None
+    elements = []
+    while True:
+        line = file.readline()
+        if not line:
+            raise ValueError('the PLY header never ends')
+        words = line.decode('ascii').split()
+        if not words:
+            continue
+        if words[0] == 'format':
+            file_format = words[1]
+        elif words[0] == 'element':
+            elements.append((words[1], int(words[2]), []))
+        elif words[0] == 'property' and words[1] == 'list':
+            elements[-1][2].append((words[4], (ply_types[words[2]], ply_types[words[3]])))
+        elif words[0] == 'property':
+            elements[-1][2].append((words[2], ply_types[words[1]]))
+        elif words[0] == 'end_header':
+            break
+    if file_format != 'ascii' and file_format not in ply_byte_orders:
+        raise ValueError(f'unknown PLY format {file_format}')
+    return file_format, elements
+
+# the positions, normals and colors in a chunk of vertices, as a dictionary of columns by property name
+def ply_vertex_attributes(columns, names):
+    positions = np.stack([columns[name] for name in ('x', 'y', 'z')], axis=1).astype('float32')
+    normals = None
+    if all(name in names for name in ('nx', 'ny', 'nz')):
+        normals = np.stack([columns[name] for name in ('nx', 'ny', 'nz')], axis=1).astype('float32')
+    colors = None
+    if all(name in names for name in ('red', 'green', 'blue')):
+        channels = [name for name in ('red', 'green', 'blue', 'alpha') if name in names]
+        colors = to_colors(np.stack([columns[name] for name in channels], axis=1))
+    return positions, normals, colors
+
+# the face element's list of vertex indices, which has to be its only property
+def ply_face_list(path, properties):
+    if len(properties) != 1 or not isinstance(properties[0][1], tuple):
+        raise ValueError(f'{path}: faces can only have a list of vertex indices')
+    return properties[0][1]
+
+# the triangles of count binary polygons, as arrays of (n, 3) vertex indices
+# a polygon's record is only as long as its number of corners, so where a record starts depends on
+#   every record before it; rather than stepping through them one at a time, each run of polygons
+#   with as many corners as the first is read at once (which is the whole chunk when they are all
+#   triangles, or all quads), checking the lengths of the records it expects against the data
+def read_binary_polygons(file, count, length_type, index_type):
+    record_start = length_type.itemsize
+    data = b''
+    while count:
+        more = file.read(chunk_size)
+        if not more:
+            raise ValueError('the PLY file ends before its last face')
+        data += more
+        offset = 0
+        while count and offset + record_start <= len(data):
+            corner_count = int(np.frombuffer(data, length_type, 1, offset)[0])
+            record_size = record_start + corner_count * index_type.itemsize
+            run = min(count, (len(data) - offset) // record_size)
+            if run == 0:
+                break
+            lengths = np.ndarray(run, length_type, data, offset, (record_size,))
+            mismatched = np.flatnonzero(lengths != corner_count)
+            if len(mismatched):
+                run = int(mismatched[0])
+            if corner_count >= 3:
+                yield fan_polygons(np.ndarray((run, corner_count), index_type, data, offset + record_start, (record_size, index_type.itemsize)).astype('int64'))
+            offset += run * record_size
+            count -= run
+        data = data[offset:]
+    # gives back whatever was read past the faces
+    file.seek(-len(data), os.SEEK_CUR)
+
+# reads a PLY file, in ASCII or either binary format, into the keyword arguments for a Mesh
+#   the vertex element's x, y, z, nx, ny, nz, red, green, blue and alpha properties are read, along
+#   with the face element's list of vertex indices, and any other elements are skipped
+# binary vertices are read straight into structured arrays, and ASCII ones are parsed a chunk of lines at a time
+def load_ply(path):
+    position_chunks = []
+    normal_chunks = []
+    color_chunks = []
+    triangle_chunks = []
+
+    with open(path, 'rb') as file:
+        file_format, elements = read_ply_header(file)
+        byte_order = ply_byte_orders.get(file_format)
+        reader = LineReader(file, chunk_size) if byte_order is None else None
+        read_elements = set()
+
+        for element, count, properties in elements:
+            # anything after the vertices and faces is never read
+            if {'vertex', 'face'} <= read_elements:
+                break
+            read_elements.add(element)
+            names = [name for name, _ in properties]
+
+            if byte_order is None and element == 'face':
+                ply_face_list(path, properties)
+                while count:
+                    text = np.frombuffer(reader.read(count), dtype='uint8')
+                    if len(text) == 0:
+                        raise ValueError(f'{path}: the file ends before its last face')
+                    # each line is the number of corners followed by their vertex indices
+                    words = tokens_per_line(text)
+                    values = parse_numbers(text.tobytes(), 'int64')
+                    lengths_at = np.cumsum(words) - words
+                    if len(values) != words.sum() or (values[lengths_at] != words - 1).any():
+                        raise ValueError(f'{path}: every face needs as many vertex indices as it says it has')
+                    corners = np.ones(len(values), dtype=bool)
+                    corners[lengths_at] = False
+                    triangle_chunks.append(values[corners][fan_triangles(words - 1)])
+                    count -= len(words)
+
+            elif byte_order is None:
+                if element == 'vertex' and any(isinstance(property_type, tuple) for _, property_type in properties):
+                    raise ValueError(f'{path}: vertices cannot have list properties')
+                while count:
+                    data = reader.read(count)
+                    if not data:
+                        raise ValueError(f'{path}: the file ends before its last {element}')
+                    lines = data.count(b'\n')
+                    if element == 'vertex':
+                        values = parse_numbers(data, 'float64')
+                        if len(values) != lines * len(names):
+                            raise ValueError(f'{path}: every vertex needs {len(names)} values')
+                        values = values.reshape(lines, len(names))
+                        columns = {name: values[:, column].astype(property_type) for column, (name, property_type) in enumerate(properties)}
+                        attributes = ply_vertex_attributes(columns, names)
+                        position_chunks.append(attributes[0])
+                        normal_chunks.append(attributes[1])
+                        color_chunks.append(attributes[2])
+                    count -= lines
+
+            elif element == 'face':
+                length_type, index_type = ply_face_list(path, properties)
+                triangle_chunks.extend(read_binary_polygons(file, count, np.dtype(byte_order + length_type), np.dtype(byte_order + index_type)))
+
+            else:
+                if any(isinstance(property_type, tuple) for _, property_type in properties):
+                    raise ValueError(f'{path}: cannot skip the {element} element, which has list properties')
+                dtype = np.dtype([(name, byte_order + property_type) for name, property_type in properties])
+                if element != 'vertex':
+                    file.seek(count * dtype.itemsize, os.SEEK_CUR)
+                    continue
+                while count:
+                    data = file.read(min(count, max(chunk_size // dtype.itemsize, 1)) * dtype.itemsize)
+                    if len(data) < dtype.itemsize:
+                        raise ValueError(f'{path}: the file ends before its last vertex')
+                    vertices = np.frombuffer(data, dtype, len(data) // dtype.itemsize)
+                    attributes = ply_vertex_attributes(vertices, names)
+                    position_chunks.append(attributes[0])
+                    normal_chunks.append(attributes[1])
+                    color_chunks.append(attributes[2])
+                    count -= len(vertices)
+
+    if not position_chunks:
+        raise ValueError(f'{path}: the file has no vertices')
+    normals = None
+    if all(chunk is not None for chunk in normal_chunks):
+        normals = np.concatenate(normal_chunks)
+    colors = None
+    if all(chunk is not None for chunk in color_chunks):
+        colors = np.concatenate(color_chunks)
+    triangles = np.concatenate(triangle_chunks) if triangle_chunks else np.empty((0, 3), dtype='int64')
+    return build_mesh(np.concatenate(position_chunks), triangles, normals, colors)
+
+# reads an OBJ or PLY file into the keyword arguments for a Mesh, with every face split into triangles
+loaders = {'.obj': load_obj, '.ply': load_ply}
+
+def load_mesh(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in loaders:
+        raise ValueError(f'{path}: only {" and ".join(loaders)} files can be loaded')
+    return loaders[extension](path)
@@ -0,0 +1,11 @@
+import os
+from rendered_object import RenderedObject
+from mesh import Mesh
+from mesh_loader import load_mesh
+
+class Model(RenderedObject):
+    # an object drawn with a mesh loaded from an OBJ or PLY file (see mesh_loader.py)
+    #   each file is only read once, and its mesh is shared by every model made from it
+    def __init__(self, path, color=(1.0, 1.0, 1.0, 1.0), material_index=0):
+        path = os.path.abspath(path)
+        super().__init__(Mesh.get(('file', path), lambda: load_mesh(path)), color, material_index)
@@ -0,0 +1,92 @@
+import ctypes
+import numpy as np
+from OpenGL.GL import *
+from gl_state import GLState
+from camera import Camera
+from mesh import Mesh
+from shader_program import ShaderProgram
+from profiler import Profiler
+
+class NormalOverlay:
+    # debug view of the normals of every object that has show_normals set, drawn as lines
+    #   after the main pass, with one program bind and one draw call per mesh
+    # each mesh gets a line buffer the first time its normals are drawn, holding every distinct
+    #   vertex (position and normal) once, as a pair of vertices the shader pulls apart along the normal
+    #   the strip indices repeat vertices and contain restart entries, neither of which should be a line
+    enabled = True
+    # how long the lines are, in world units
+    normal_length = 0.5
+
+    # the vertex array, line buffer, instance buffer, instance capacity and vertex count of each mesh
+    line_buffers = {}
+
+    @staticmethod
+    def toggle():
+        NormalOverlay.enabled = not NormalOverlay.enabled
+        return NormalOverlay.enabled
+
+    # every distinct (position, normal) pair used by the mesh's indices, each written out twice
+    @staticmethod
+    def build_lines(mesh):
+        indices = np.asarray(mesh.indices)
+        # the restart index is the largest value of the index type (see main.py)
+        used = np.unique(indices[indices != np.iinfo(indices.dtype).max])
+        vertices = np.concatenate((np.reshape(mesh.vertices, (-1, 3))[used], np.reshape(mesh.normals, (-1, 3))[used]), axis=1)
+        vertices = np.unique(vertices.astype('float32'), axis=0)
+        return np.repeat(vertices, 2, axis=0)
+
+    @staticmethod
+    def get_line_buffer(mesh):
+        line_buffer = NormalOverlay.line_buffers.get(mesh)
+        if line_buffer is None:
+            lines = NormalOverlay.build_lines(mesh)
+            vao = glGenVertexArrays(1)
+            GLState.bind_vertex_array(vao)
+
+            # positions and normals interleaved, at the same locations as in the mesh's own vertex array
+            line_vbo = glGenBuffers(1)
+            GLState.bind_buffer(GL_ARRAY_BUFFER, line_vbo)
+            glBufferData(GL_ARRAY_BUFFER, lines.nbytes, lines, GL_STATIC_DRAW)
+            stride = lines.itemsize * 6
+            glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, stride, None)
+            glEnableVertexAttribArray(0)
+            glVertexAttribPointer(2, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(lines.itemsize * 3))
+            glEnableVertexAttribArray(2)
+
+            # the mesh's instance buffer holds whatever the main pass drew, so this has its own
+            instance_vbo = glGenBuffers(1)
+            GLState.bind_buffer(GL_ARRAY_BUFFER, instance_vbo)
+            Mesh.set_instance_attributes()
+
+            GLState.bind_vertex_array(0)
+            GLState.bind_buffer(GL_ARRAY_BUFFER, 0)
+            line_buffer = [vao, line_vbo, instance_vbo, 0, len(lines)]
+            NormalOverlay.line_buffers[mesh] = line_buffer
+        return line_buffer
+
+    # draws the normals of whichever of the objects have them turned on
+    #   (the transform store must be up to date, as it is after the main pass)
+    @staticmethod
+    def draw(objects):
+        if not NormalOverlay.enabled:
+            return
+        groups = {}
+        for rendered_object in objects:
+            if rendered_object.show_normals:
+                groups.setdefault(rendered_object.mesh, []).append(rendered_object)
+        if not groups:
+            return
+
+        with Profiler.scope('draw_normals'):
+            shader = ShaderProgram.get('normal_shader.vert', 'normal_shader.frag')
+            GLState.use_program(shader.program)
+            GLState.uniform_matrix4fv(shader.uniform_location('projectionMatrix'), Camera.instance.projection_matrix)
+            GLState.uniform_matrix4fv(shader.uniform_location('viewMatrix'), Camera.instance.view_matrix)
+            GLState.uniform1f(shader.uniform_location('normalLength'), NormalOverlay.normal_length)
+
+            for mesh, instances in groups.items():
+                line_buffer = NormalOverlay.get_line_buffer(mesh)
+                vao, _, instance_vbo, capacity, vertex_count = line_buffer
+                line_buffer[3] = Mesh.upload_instances(instance_vbo, capacity, Mesh.pack_instances(instances))
+                GLState.bind_vertex_array(vao)
+                glDrawArraysInstanced(GL_LINES, 0, vertex_count, len(instances))
@@ -1,9 +1,7 @@
-#version 460 core
+#version 450 core
 
-in GS_OUT {
-    vec4 vertPosition;
+in VS_OUT {
     vec4 vertColor;
-    vec3 vertNormal;
 } fs_in;
 
 out vec4 fragColor;
@@ -11,4 +9,4 @@ out vec4 fragColor;
 void main() 
 {
     fragColor = fs_in.vertColor;
-}
\ No newline at end of file
+}
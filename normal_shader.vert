@@ -1,25 +1,31 @@
-#version 460 core
+#version 450 core
 
+// each normal is drawn as a line between a pair of vertices with the same position and normal
 layout(location = 0) in vec4 position;
-layout(location = 1) in vec4 color;
 layout(location = 2) in vec3 normal;
+layout(location = 3) in vec4 instanceColor;
+layout(location = 4) in mat4 modelMatrix;
+// inverse transpose of the model matrix, computed once per object on the OpenGL side
+layout(location = 9) in mat3 normalMatrix;
 
 uniform mat4 projectionMatrix;
-uniform mat4 modelviewMatrix;
+uniform mat4 viewMatrix;
+uniform float normalLength;
 
 out VS_OUT {
-    vec4 vertPosition;
     vec4 vertColor;
-    vec3 vertNormal;
 } vs_out;
 
 void main() 
 {
-    gl_Position = projectionMatrix * (modelviewMatrix * position);
-    vs_out.vertPosition = gl_Position;
+    vec4 viewPosition = viewMatrix * (modelMatrix * position);
 
-    vs_out.vertColor = color;
-    
-    mat3 normalMatrix = mat3(transpose(inverse(modelviewMatrix)));
-    vs_out.vertNormal = normalize(normalMatrix * normal);
-}
\ No newline at end of file
+    // the second vertex of each pair is moved out along the normal
+    //   this happens in view space (which is not scaled), so every line is the same length
+    if ((gl_VertexID & 1) == 1) {
+        viewPosition.xyz += normalize(mat3(viewMatrix) * (normalMatrix * normal)) * normalLength;
+    }
+    gl_Position = projectionMatrix * viewPosition;
+
+    vs_out.vertColor = instanceColor;
+}
@@ -0,0 +1,125 @@
+import json
+import time
+import ctypes
+import contextlib
+from collections import deque
+import numpy as np
+from OpenGL.GL import *
+
+class ProfileScope:
+    # times the code inside a with block, on the CPU and (optionally) on the GPU
+    #   the GPU time is taken from timestamps written into the command stream at either end,
+    #   so it covers the OpenGL work issued inside the block, however long after it actually runs
+    def __init__(self, name, gpu):
+        self.name = name
+        self.gpu = gpu
+
+    def __enter__(self):
+        if self.gpu:
+            self.start_query = Profiler.timestamp()
+        self.start_time = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exception):
+        Profiler.add_sample('cpu', self.name, Profiler.frame, (time.perf_counter_ns() - self.start_time) / 1e6)
+        if self.gpu:
+            Profiler.pending_queries.append((Profiler.frame, self.name, self.start_query, Profiler.timestamp()))
+        return False
+
+class Profiler:
+    # per-pass timings of each frame, off unless started (and then close to free when disabled)
+    enabled = False
+    frame = 0
+
+    # the most recent samples of each scope, in milliseconds, by (kind, name)
+    #   percentiles are taken over these, so they follow the last few seconds of frames
+    history = 600
+    samples = {}
+
+    # GPU scopes waiting for their timestamps, as (frame, name, start query, end query)
+    #   these are read back frames later, once OpenGL reports they are available,
+    #   so reading them never waits on the GPU
+    # GL_TIME_ELAPSED queries cannot be nested (only one can be active at a time),
+    #   which is why each scope uses a pair of GL_TIMESTAMP queries instead
+    pending_queries = deque()
+    free_queries = []
+
+    # every sample is also written here as a line of JSON, if it was given a file
+    export_file = None
+
+    disabled_scope = contextlib.nullcontext()
+
+    @staticmethod
+    def start(export_path=None):
+        Profiler.enabled = True
+        if export_path is not None:
+            Profiler.export_file = open(export_path, 'w')
+
+    @staticmethod
+    def stop():
+        # whatever is still on the GPU is waited for, so no samples are lost
+        glFinish()
+        Profiler.read_queries()
+        Profiler.enabled = False
+        if Profiler.export_file is not None:
+            Profiler.export_file.close()
+            Profiler.export_file = None
+
+    # with Profiler.scope('name'): ... times the block, on the GPU as well unless gpu is False
+    @staticmethod
+    def scope(name, gpu=True):
+        if not Profiler.enabled:
+            return Profiler.disabled_scope
+        return ProfileScope(name, gpu)
+
+    # should be called once at the end of every frame
+    @staticmethod
+    def end_frame():
+        if Profiler.enabled:
+            Profiler.read_queries()
+            Profiler.frame += 1
+
+    @staticmethod
+    def add_sample(kind, name, frame, milliseconds):
+        key = (kind, name)
+        if key not in Profiler.samples:
+            Profiler.samples[key] = deque(maxlen=Profiler.history)
+        Profiler.samples[key].append(milliseconds)
+        if Profiler.export_file is not None:
+            Profiler.export_file.write(json.dumps({'frame': frame, 'kind': kind, 'scope': name, 'ms': milliseconds}) + '\n')
+
+    # a query that records the GPU's clock once everything issued before it has run
+    @staticmethod
+    def timestamp():
+        if not Profiler.free_queries:
+            Profiler.free_queries.extend(np.atleast_1d(glGenQueries(32)).tolist())
+        query = Profiler.free_queries.pop()
+        glQueryCounter(query, GL_TIMESTAMP)
+        return query
+
+    @staticmethod
+    def query_result(query):
+        result = ctypes.c_uint64(0)
+        glGetQueryObjectui64v(query, GL_QUERY_RESULT, ctypes.byref(result))
+        return result.value
+
+    # collects every GPU scope that has finished
+    #   the GPU runs commands in order, so the first one not done yet means none after it are either
+    @staticmethod
+    def read_queries():
+        while Profiler.pending_queries:
+            frame, name, start_query, end_query = Profiler.pending_queries[0]
+            if not glGetQueryObjectiv(end_query, GL_QUERY_RESULT_AVAILABLE):
+                break
+            Profiler.pending_queries.popleft()
+            Profiler.add_sample('gpu', name, frame, (Profiler.query_result(end_query) - Profiler.query_result(start_query)) / 1e6)
+            Profiler.free_queries.extend((start_query, end_query))
+
+    # rolling p50/p95/p99 of every scope, one line each
+    @staticmethod
+    def report():
+        lines = []
+        for (kind, name), samples in sorted(Profiler.samples.items(), key=lambda item: (item[0][1], item[0][0])):
+            p50, p95, p99 = np.percentile(samples, (50, 95, 99))
+            lines.append(f'{name:>14} {kind}: p50 {p50:8.3f}ms  p95 {p95:8.3f}ms  p99 {p99:8.3f}ms  ({len(samples)} samples)')
+        return '\n'.join(lines)
@@ -0,0 +1,127 @@
+import numpy as np
+from camera import Camera
+from gl_state import GLState
+from geometry_arena import GeometryArena
+
+# sort keys are 64-bit integers, laid out from the most significant bits down so that sorting
+#   them groups draws by the state that is most expensive to change:
+#     pass (4 bits) | program (12 bits) | mesh (16 bits) | material (8 bits) | depth (24 bits)
+# items that share a pass, program and mesh are merged into one batch of instances
+#   (the material is read per instance from the material buffer, so it orders a batch without splitting it)
+# every mesh lives in the geometry arena, so all the batches of a pass and program go out
+#   together as one multi-draw
+pass_shift = 60
+program_shift = 48
+mesh_shift = 32
+material_shift = 24
+depth_bits = 24
+batch_shift = mesh_shift
+program_run_shift = program_shift
+
+# sorts keys with a least significant digit radix sort over 16-bit digits
+#   numpy's stable sort is a radix sort itself for 16-bit integers, so each pass is linear,
+#   and passes over digits that are the same for every key (like an unused pass field) are skipped
+def radix_sort(keys):
+    order = np.arange(len(keys))
+    for shift in range(0, 64, 16):
+        digits = ((keys[order] >> np.uint64(shift)) & np.uint64(0xFFFF)).astype('uint16')
+        if len(digits) == 0 or (digits == digits[0]).all():
+            continue
+        order = order[np.argsort(digits, kind='stable')]
+    return order
+
+class RenderQueue:
+    # rendered objects are submitted every frame, and drawn in sorted order when the queue is flushed
+    #   opaque objects are sorted front to back, so nearer objects fill the depth buffer first
+    #   and the fragments hidden behind them are rejected before they are shaded
+    opaque_pass = 0
+
+    def __init__(self):
+        # programs and meshes get a small number each, the first time they are submitted
+        self.programs = []
+        self.program_ids = {}
+        self.meshes = []
+        self.mesh_ids = {}
+
+        self.objects = []
+        self.keys = []
+
+        # the items and batches drawn in the last flush
+        self.item_count = 0
+        self.batch_count = 0
+        self.draw_count = 0
+
+    def id_of(self, value, values, ids):
+        if value not in ids:
+            ids[value] = len(values)
+            values.append(value)
+        return ids[value]
+
+    # queues the objects to be drawn with a program (a ShaderProgram) in a pass
+    #   the transform store must be up to date, since their depth comes from their world matrices
+    def submit(self, objects, program, render_pass=opaque_pass):
+        if len(objects) == 0:
+            return
+        camera = Camera.instance
+        program_id = self.id_of(program, self.programs, self.program_ids)
+        mesh_ids = np.fromiter((self.id_of(rendered_object.mesh, self.meshes, self.mesh_ids) for rendered_object in objects), 'uint64', len(objects))
+        materials = np.fromiter((rendered_object.material_index for rendered_object in objects), 'uint64', len(objects))
+        transform_indices = np.fromiter((rendered_object.transform_index for rendered_object in objects), 'int64', len(objects))
+
+        # the distance of each object's origin in front of the camera, scaled between the near and far planes
+        transform_store = objects[0].transform_store
+        positions = transform_store.world_matrices[transform_indices, 3, :3].astype('float64')
+        view_matrix = camera.view_matrix.astype('float64')
+        distances = -(positions @ view_matrix[:3, 2] + view_matrix[3, 2])
+        depth_scale = ((1 << depth_bits) - 1) / (camera.far - camera.near)
+        depths = np.clip((distances - camera.near) * depth_scale, 0, (1 << depth_bits) - 1).astype('uint64')
+
+        keys = ((np.uint64(render_pass) << np.uint64(pass_shift))
+                | (np.uint64(program_id) << np.uint64(program_shift))
+                | (mesh_ids << np.uint64(mesh_shift))
+                | ((materials & np.uint64(0xFF)) << np.uint64(material_shift))
+                | depths)
+        self.objects.extend(objects)
+        self.keys.append(keys)
+
+    # draws everything submitted since the last flush, in order, and empties the queue
+    def flush(self):
+        if not self.objects:
+            self.item_count = self.batch_count = self.draw_count = 0
+            return
+        keys = np.concatenate(self.keys)
+        order = radix_sort(keys)
+        keys = keys[order]
+        objects = [self.objects[index] for index in order]
+
+        # a new batch starts wherever the mesh changes, and a new run of batches wherever the program does
+        starts = RenderQueue.changes(keys, batch_shift)
+        ends = np.append(starts[1:], len(keys))
+        batches = [(self.meshes[(int(keys[start]) >> mesh_shift) & 0xFFFF], objects[start:end]) for start, end in zip(starts.tolist(), ends.tolist())]
+        run_starts = np.searchsorted(starts, RenderQueue.changes(keys, program_run_shift))
+        run_ends = np.append(run_starts[1:], len(starts))
+
+        camera = Camera.instance
+        arena = GeometryArena.get_instance()
+        for run_start, run_end in zip(run_starts.tolist(), run_ends.tolist()):
+            program = self.programs[(int(keys[starts[run_start]]) >> program_shift) & 0xFFF]
+            # switching to a program that is already in use (and setting uniforms it already has) is skipped
+            program.use()
+            GLState.uniform_matrix4fv(program.uniform_location('projectionMatrix'), camera.projection_matrix)
+            GLState.uniform_matrix4fv(program.uniform_location('viewMatrix'), camera.view_matrix)
+            arena.draw(batches[run_start:run_end])
+
+        self.item_count = len(keys)
+        self.batch_count = len(batches)
+        self.draw_count = len(run_starts)
+        self.objects = []
+        self.keys = []
+
+    # where the sorted keys start to differ in any of the bits from shift up
+    @staticmethod
+    def changes(keys, shift):
+        states = keys >> np.uint64(shift)
+        return np.flatnonzero(np.concatenate(([True], states[1:] != states[:-1])))
+
+    def report(self):
+        return f'{self.item_count} items in {self.batch_count} batches, drawn with {self.draw_count} multi-draws'
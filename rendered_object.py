@@ -3,121 +3,92 @@ from OpenGL.GL import *
 import math
 from camera import *
 from light import *
+from transform_store import TransformStore
+from profiler import Profiler
+from render_queue import RenderQueue
 
 class RenderedObject:
-    proj_loc = None
-    modelview_loc = None
-    normal_proj_loc = None
-    normal_modelview_loc = None
-
-    def __init__(self, model_matrix=np.array([[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0], [0.0, 0.0, 0.0, 1.0]], dtype='float32')):
-        self.model_matrix = model_matrix
-
-    # TODO: transpose all
+    # the program objects are drawn with (a ShaderProgram)
+    shader = None
+    # every draw goes through the queue, which orders and batches them
+    render_queue = RenderQueue()
+
+    # the mesh is shared between every object drawn with the same geometry,
+    #   so an instance only carries its own transform, color and material
+    # the transform itself lives in the shared transform store, the object only keeps its slot
+    def __init__(self, mesh=None, color=(1.0, 1.0, 1.0, 1.0), material_index=0, model_matrix=None):
+        self.mesh = mesh
+        self.color = color
+        self.material_index = material_index
+        # whether the debug overlay draws this object's normals (see normal_overlay.py)
+        self.show_normals = False
+        # coarser versions of the mesh to switch to when the object is small on screen, most detailed
+        #   first, and the one in use (see level_of_detail.py)
+        self.lod_meshes = None
+        self.lod_level = 0
+        self.transform_store = TransformStore.get_instance()
+        self.transform_index = self.transform_store.allocate()
+        if model_matrix is not None:
+            self.model_matrix = model_matrix
+
+    # gives the slot back to the store once the object is no longer used
+    def __del__(self):
+        transform_store = getattr(self, 'transform_store', None)
+        if transform_store is not None:
+            transform_store.free(self.transform_index)
+
+    @property
+    def model_matrix(self):
+        return self.transform_store.model_matrix(self.transform_index)
+
+    @model_matrix.setter
+    def model_matrix(self, model_matrix):
+        self.transform_store.set_matrix(self.transform_index, model_matrix)
+
+    # the model matrix combined with those of every parent above the object
+    @property
+    def world_matrix(self):
+        return self.transform_store.world_matrix(self.transform_index)
+
+    # every transform is applied in the object's own space, before the ones it already has
     def translate(self, x, y, z):
-        translate_matrix = np.array([
-            [1.0, 0.0, 0.0, x],
-            [0.0, 1.0, 0.0, y],
-            [0.0, 0.0, 1.0, z],
-            [0.0, 0.0, 0.0, 1.0]
-        ], dtype='float32')
-        translate_matrix = np.transpose(translate_matrix)
-        self.model_matrix = translate_matrix @ self.model_matrix
+        self.transform_store.translate(self.transform_index, (x, y, z))
 
     def scale(self, x, y, z):
-        scale_matrix = np.array([
-            [x, 0.0, 0.0, 0.0],
-            [0.0, y, 0.0, 0.0],
-            [0.0, 0.0, z, 0.0],
-            [0.0, 0.0, 0.0, 1.0]
-        ], dtype='float32')
-        scale_matrix = np.transpose(scale_matrix)
-        self.model_matrix = scale_matrix @ self.model_matrix
-
-    # TODO: can these three rotate functions be combined into one function? does the order matter?
+        self.transform_store.scale(self.transform_index, (x, y, z))
+
     def rotate_around_x(self, deg):
-        x_rot_matrix = np.array([
-            [1.0, 0.0, 0.0, 0.0],
-            [0.0, math.cos(math.radians(deg)), -math.sin(math.radians(deg)), 0.0],
-            [0.0, math.sin(math.radians(deg)), math.cos(math.radians(deg)), 0.0],
-            [0.0, 0.0, 0.0, 1.0]
-        ], dtype='float32')
-        x_rot_matrix = np.transpose(x_rot_matrix)
-        self.model_matrix = x_rot_matrix @ self.model_matrix
+        self.transform_store.rotate(self.transform_index, (1.0, 0.0, 0.0), deg)
 
     def rotate_around_y(self, deg):
-        y_rot_matrix = np.array([
-            [math.cos(math.radians(deg)), 0.0, math.sin(math.radians(deg)), 0.0],
-            [0.0, 1.0, 0.0, 0.0],
-            [-math.sin(math.radians(deg)), 0.0, math.cos(math.radians(deg)), 0.0],
-            [0.0, 0.0, 0.0, 1.0]
-        ], dtype='float32')
-        y_rot_matrix = np.transpose(y_rot_matrix)
-        self.model_matrix = y_rot_matrix @ self.model_matrix
+        self.transform_store.rotate(self.transform_index, (0.0, 1.0, 0.0), deg)
 
     def rotate_around_z(self, deg):
-        z_rot_matrix = np.array([
-            [math.cos(math.radians(deg)), -math.sin(math.radians(deg)), 0.0, 0.0],
-            [math.sin(math.radians(deg)), math.cos(math.radians(deg)), 0.0, 0.0],
-            [0.0, 0.0, 1.0, 0.0],
-            [0.0, 0.0, 0.0, 1.0]
-        ], dtype='float32')
-        z_rot_matrix = np.transpose(z_rot_matrix)
-        self.model_matrix = z_rot_matrix @ self.model_matrix
+        self.transform_store.rotate(self.transform_index, (0.0, 0.0, 1.0), deg)
 
     def apply_transform(self, transformation_matrix=np.array([[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0], [0.0, 0.0, 0.0, 1.0]], dtype='float32')):
         # transformation_matrix = np.transpose(transformation_matrix)
         self.model_matrix = transformation_matrix @ self.model_matrix
 
-    # this method allows for fetching the current transformation 
-    #   matrices at the time an object is rendered.
+    # groups the objects by the mesh they use, so each group is a single instanced draw call
     @staticmethod
-    def update_matrices(modelview_matrix):
-        flat_proj_mat = np.array(Camera.instance.projection_matrix).flatten()
-        flat_modelview_mat = np.array(modelview_matrix).flatten()
-
-        # load matrix values into uniforms for shader
-        glUniformMatrix4fv(RenderedObject.proj_loc, 1, GL_FALSE, flat_proj_mat)
-        glUniformMatrix4fv(RenderedObject.modelview_loc, 1, GL_FALSE, flat_modelview_mat)
-
-    def draw_object(self): 
-        modelview_matrix = self.model_matrix @ Camera.instance.view_matrix
-
-        # fetch most recent matrices for shaders
-        RenderedObject.update_matrices(modelview_matrix)
-
-        for light in Light.all_lights:
-            light.assign_uniform_values(modelview_matrix)
+    def group_by_mesh(objects):
+        groups = {}
+        for rendered_object in objects:
+            groups.setdefault(rendered_object.mesh, []).append(rendered_object)
+        return groups
+
+    # draws any number of objects with one draw call per mesh
+    #   the camera matrices are set by the render queue, for each program it switches to
+    #   (the model matrix of each object is read from the instance buffer)
+    @staticmethod
+    def draw_objects(objects):
+        with Profiler.scope('draw_objects'):
+            # rebuild the model matrices of everything that moved, all at once
+            TransformStore.get_instance().update()
 
-        # additional functionality will be handled by child classes
-        pass
+            RenderedObject.render_queue.submit(objects, RenderedObject.shader)
+            RenderedObject.render_queue.flush()
 
-    # this method allows for fetching the current transformation 
-    #   matrices at the time an object is rendered.
-    # configured to work with a different program's uniform locations
-    @staticmethod
-    def update_normal_matrices(modelview_matrix):
-        # # TODO: this should be handled in a parent class
-        # # access current transformation matrices
-        # proj_mat = glGetFloatv(GL_PROJECTION_MATRIX)
-        # modelview_mat = glGetFloatv(GL_MODELVIEW_MATRIX)
-
-        # # flatten the matrices to arrays
-        # flat_proj_mat = np.array(proj_mat).flatten()
-        # flat_modelview_mat = np.array(modelview_mat).flatten()
-
-        flat_proj_mat = np.array(Camera.instance.projection_matrix).flatten()
-        flat_modelview_mat = np.array(modelview_matrix).flatten()
-
-        # load matrix values into uniforms for shader
-        glUniformMatrix4fv(RenderedObject.normal_proj_loc, 1, GL_FALSE, flat_proj_mat)
-        glUniformMatrix4fv(RenderedObject.normal_modelview_loc, 1, GL_FALSE, flat_modelview_mat)
-
-    def draw_normals(self):
-        # fetch most recent matrices for shaders
-        modelview_matrix = self.model_matrix @ Camera.instance.view_matrix
-        RenderedObject.update_normal_matrices(modelview_matrix)
-
-        # additional functionality will be handled by child classes
-        # however, they should all call use GL_POINTS as the draw mode
-        pass
+    def draw_object(self):
+        RenderedObject.draw_objects([self])
@@ -0,0 +1,67 @@
+from rendered_object import RenderedObject
+
+class SceneNode:
+    # a node wraps a rendered object, whose transform becomes relative to the node's parent
+    #   nodes without an object are just groups, with a transform but nothing to draw
+    # the hierarchy itself is kept in the transform store, so updating the world
+    #   matrices never walks these nodes one at a time
+    def __init__(self, rendered_object=None, name=None, parent=None):
+        self.rendered_object = rendered_object if rendered_object is not None else RenderedObject()
+        self.name = name
+        self.parent = None
+        self.children = []
+        if parent is not None:
+            parent.add_child(self)
+
+    def add_child(self, node):
+        if node.parent is not None:
+            node.parent.children.remove(node)
+        node.rendered_object.transform_store.set_parent(node.rendered_object.transform_index, self.rendered_object.transform_index)
+        node.parent = self
+        self.children.append(node)
+
+    # the child (and everything below it) is left without a parent
+    def remove_child(self, node):
+        node.rendered_object.transform_store.set_parent(node.rendered_object.transform_index, -1)
+        node.parent = None
+        self.children.remove(node)
+
+    # every node in this subtree, parents before their children
+    def walk(self):
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    @property
+    def world_matrix(self):
+        return self.rendered_object.world_matrix
+
+class SceneGraph:
+    def __init__(self):
+        self.root = SceneNode(name='root')
+        self.nodes_by_name = {}
+
+    # adds an object to the scene, under the given parent node (or the root)
+    def add(self, rendered_object=None, name=None, parent=None):
+        node = SceneNode(rendered_object, name, self.root if parent is None else parent)
+        if name is not None:
+            self.nodes_by_name[name] = node
+        return node
+
+    def find(self, name):
+        return self.nodes_by_name[name]
+
+    def remove(self, node):
+        for descendant in node.walk():
+            self.nodes_by_name.pop(descendant.name, None)
+        node.parent.remove_child(node)
+
+    # recomputes the world matrices of everything that moved (and everything below it)
+    def update(self):
+        self.root.rendered_object.transform_store.update()
+
+    # every object in the scene that has something to draw
+    def rendered_objects(self):
+        return [node.rendered_object for node in self.root.walk() if node.rendered_object.mesh is not None]
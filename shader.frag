@@ -1,8 +1,7 @@
-#version 460 core
+#version 450 core
 
-// TODO: implement loading materials from vertices
-// flat in int matIndex;
-const int matIndex = 0;
+// index into the material table, passed along from the instance data
+flat in uint matIndex;
 
 in VS_OUT {
     vec4 vertPosition;
@@ -10,17 +9,18 @@ in VS_OUT {
     vec3 vertNormal;
 } fs_in;
 
-// TODO: make a class to build these on the OpenGL side
+// laid out with std140 rules, mirrored by Light.dtype on the OpenGL side
+//   each scalar fills the 4 bytes left over at the end of the vec3 before it
 struct LightProperties {
-    bool isEnabled;
-    bool isLocal;
-    bool isSpot;
     vec3 ambient;
+    bool isEnabled;
     vec3 color;
+    bool isLocal;
     vec3 position;
+    bool isSpot;
     vec3 halfVector;
-    vec3 coneDirection;
     float spotCosCutoff;
+    vec3 coneDirection;
     float spotExponent;
     float constantAttenuation;
     float linearAttenuation;
@@ -28,24 +28,36 @@ struct LightProperties {
     float specularStrength;
 };
 
-// TODO: make a class to build these on the OpenGL side
+// laid out with std430 rules, mirrored by Material.dtype on the OpenGL side
 struct MaterialProperties {
     vec3 emission;
+    float shininess;
     vec3 ambient;
     vec3 diffuse;
     vec3 specular;
-    float shininess;
 };
 
-const int maxMaterials = 14;
-uniform MaterialProperties materials[maxMaterials];
+// the table is sized by the OpenGL side, so it can hold any number of materials
+layout(std430, binding = 1) readonly buffer MaterialBlock {
+    MaterialProperties materials[];
+};
 
 const int maxLights = 10;
-uniform LightProperties lights[maxLights];
-uniform vec3 eyeDirection;
+layout(std140, binding = 0) uniform LightBlock {
+    LightProperties lights[maxLights];
+};
+
+// the kinds of lights in use, defined by the OpenGL side (see Light.shader_defines)
+//   without them, every light is checked for what it is on every fragment
+#ifndef LIGHT_COUNT
+#define LIGHT_COUNT maxLights
+#define SKIP_DISABLED
+#define ANY_LOCAL
+#define ANY_DIRECTIONAL
+#define ANY_SPOT
+#endif
 
-uniform mat4 projectionMatrix;
-uniform mat4 modelviewMatrix;
+uniform vec3 eyeDirection;
 
 out vec4 fragColor;
 
@@ -55,9 +67,25 @@ void main()
     vec3 reflectedLight = vec3(0.0);
 
     // iterate over lights
-    for (int light = 0; light < lights.length(); light++) {
+    for (int light = 0; light < LIGHT_COUNT; light++) {
+#ifdef SKIP_DISABLED
         if (!lights[light].isEnabled)
             continue;
+#endif
+
+        // when every light is the same kind, these are constants and the other branches compile away
+#if defined(ANY_LOCAL) && defined(ANY_DIRECTIONAL)
+        bool isLocal = lights[light].isLocal;
+#elif defined(ANY_LOCAL)
+        const bool isLocal = true;
+#else
+        const bool isLocal = false;
+#endif
+#ifdef ANY_SPOT
+        bool isSpot = lights[light].isSpot;
+#else
+        const bool isSpot = false;
+#endif
         
         vec3 halfVector;
         // TODO: this will not work properly
@@ -65,14 +93,14 @@ void main()
         // vec3 lightDirection = vec3(1.0, 0.0, 0.0);
         float attenuation = 1.0;
 
-        if (lights[light].isLocal) {
+        if (isLocal) {
             lightDirection = lightDirection - vec3(fs_in.vertPosition);
             float lightDistance = length(lightDirection);
             lightDirection = lightDirection / lightDistance;
 
             attenuation = 1.0 / (lights[light].constantAttenuation + lights[light].linearAttenuation * lightDistance + lights[light].quadraticAttenuation * lightDistance * lightDistance);
 
-            if (lights[light].isSpot) {
+            if (isSpot) {
                 float spotCos = dot(lightDirection, -lights[light].coneDirection);
                 if (spotCos < lights[light].spotCosCutoff)
                     attenuation = 0.0;
@@ -1,11 +1,16 @@
-#version 460 core
+#version 450 core
 
 layout(location = 0) in vec4 position;
 layout(location = 1) in vec4 color;
 layout(location = 2) in vec3 normal;
+layout(location = 3) in vec4 instanceColor;
+layout(location = 4) in mat4 modelMatrix;
+layout(location = 8) in uint materialIndex;
+// inverse transpose of the model matrix, computed once per object on the OpenGL side
+layout(location = 9) in mat3 normalMatrix;
 
 uniform mat4 projectionMatrix;
-uniform mat4 modelviewMatrix;
+uniform mat4 viewMatrix;
 
 out VS_OUT {
     vec4 vertPosition;
@@ -13,12 +18,18 @@ out VS_OUT {
     vec3 vertNormal;
 } vs_out;
 
+// index into the material table, the same for the whole object
+flat out uint matIndex;
+
 void main() 
 {
+    mat4 modelviewMatrix = viewMatrix * modelMatrix;
+
     gl_Position = projectionMatrix * (modelviewMatrix * position);
     vs_out.vertPosition = modelviewMatrix * position;
-    vs_out.vertColor = color;
+    vs_out.vertColor = color * instanceColor;
+    matIndex = materialIndex;
 
-    mat3 normalMatrix = mat3(transpose(inverse(modelviewMatrix)));
-    vs_out.vertNormal = normalize(normalMatrix * normal);
+    // the view matrix only rotates and translates, so it is its own normal matrix
+    vs_out.vertNormal = normalize(mat3(viewMatrix) * (normalMatrix * normal));
 }
\ No newline at end of file
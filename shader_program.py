@@ -0,0 +1,176 @@
+import os
+import ctypes
+import hashlib
+import numpy as np
+from OpenGL.GL import *
+from gl_state import GLState
+
+class ShaderProgram:
+    # every program built so far, by the shader files and defines it was built from,
+    #   so each one is only compiled and linked once
+    programs = {}
+
+    # linked programs are saved here, so later launches can skip compiling them
+    cache_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.shader_cache')
+
+    # the stage of each shader, by file extension
+    stages = {
+        '.vert': GL_VERTEX_SHADER,
+        '.geom': GL_GEOMETRY_SHADER,
+        '.frag': GL_FRAGMENT_SHADER,
+    }
+
+    # how many programs were loaded from the cache and how many had to be compiled
+    loaded_count = 0
+    compiled_count = 0
+
+    # the program built from the given shader files, compiling it if it has not been yet
+    #   the defines specialize the shaders, and each different set of them is its own program
+    @staticmethod
+    def get(*paths, defines=None):
+        key = (paths, tuple(sorted((defines or {}).items())))
+        if key not in ShaderProgram.programs:
+            ShaderProgram.programs[key] = ShaderProgram(paths, defines or {})
+        return ShaderProgram.programs[key]
+
+    def __init__(self, paths, defines=None):
+        self.paths = paths
+        self.defines = defines or {}
+        self.sources = []
+        for path in paths:
+            with open(path, 'r') as file:
+                self.sources.append(ShaderProgram.add_defines(file.read(), self.defines))
+        self.uniform_locations = {}
+
+        self.program = self.load_binary()
+        if self.program is None:
+            self.program = self.compile()
+            self.save_binary()
+            ShaderProgram.compiled_count += 1
+        else:
+            ShaderProgram.loaded_count += 1
+
+    # the defines go right after the #version line, which has to come first
+    @staticmethod
+    def add_defines(source, defines):
+        if not defines:
+            return source
+        lines = source.split('\n')
+        version_line = next((number for number, line in enumerate(lines) if line.strip().startswith('#version')), -1)
+        define_lines = [f'#define {name} {value}' for name, value in sorted(defines.items())]
+        return '\n'.join(lines[:version_line + 1] + define_lines + lines[version_line + 1:])
+
+    # a binary only works with the driver that made it, so the driver is part of the key
+    #   along with every source, and any change to either misses the cache
+    def cache_path(self):
+        key = hashlib.sha256()
+        for name in (GL_VENDOR, GL_RENDERER, GL_VERSION):
+            key.update(glGetString(name))
+        for path, source in zip(self.paths, self.sources):
+            key.update(os.path.splitext(path)[1].encode())
+            key.update(source.encode())
+        return os.path.join(ShaderProgram.cache_directory, key.hexdigest() + '.bin')
+
+    # the program from the cache, or None if it is not there or the driver rejects it
+    #   (a driver update can make an old binary unusable even when the key matches)
+    def load_binary(self):
+        path = self.cache_path()
+        if glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS) == 0 or not os.path.exists(path):
+            return None
+
+        # the file holds the binary's format, followed by the binary itself
+        #   a file too short for both (e.g. cut off by a full disk) is thrown away and compiled again
+        data = np.fromfile(path, dtype=np.uint8)
+        if len(data) <= 4:
+            ShaderProgram.discard(path)
+            return None
+        binary_format = int(data[:4].view('<u4')[0])
+        binary = data[4:]
+
+        program = glCreateProgram()
+        try:
+            glProgramBinary(program, binary_format, binary, len(binary))
+            linked = glGetProgramiv(program, GL_LINK_STATUS)
+        except GLError:
+            linked = False
+        if not linked:
+            glDeleteProgram(program)
+            ShaderProgram.discard(path)
+            return None
+        return program
+
+    def save_binary(self):
+        if glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS) == 0:
+            return
+        size = glGetProgramiv(self.program, GL_PROGRAM_BINARY_LENGTH)
+        binary = np.empty(size, dtype=np.uint8)
+        length = GLsizei(0)
+        binary_format = GLenum(0)
+        glGetProgramBinary(self.program, size, ctypes.byref(length), ctypes.byref(binary_format), binary)
+
+        # written to a temporary file first, so a crash never leaves half a binary behind
+        #   the cache is only there to save time, so if it cannot be written (a read-only checkout,
+        #   a full disk) the program is just compiled again next time
+        path = self.cache_path()
+        try:
+            os.makedirs(ShaderProgram.cache_directory, exist_ok=True)
+            with open(path + '.tmp', 'wb') as file:
+                file.write(np.array([binary_format.value], dtype='<u4').tobytes())
+                file.write(binary[:length.value].tobytes())
+            os.replace(path + '.tmp', path)
+        except OSError as error:
+            print(f'could not cache the shader program binary: {error}')
+            ShaderProgram.discard(path + '.tmp')
+
+    # deletes a cache file, if it is there and can be deleted (the cache may be read-only)
+    @staticmethod
+    def discard(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    # compiles every shader and links them, raising an error with the driver's log if either fails
+    def compile(self):
+        program = glCreateProgram()
+        shaders = []
+        for path, source in zip(self.paths, self.sources):
+            shader = glCreateShader(ShaderProgram.stages[os.path.splitext(path)[1]])
+            glShaderSource(shader, source)
+            glCompileShader(shader)
+            if not glGetShaderiv(shader, GL_COMPILE_STATUS):
+                log = glGetShaderInfoLog(shader).decode()
+                glDeleteShader(shader)
+                for attached in shaders:
+                    glDeleteShader(attached)
+                glDeleteProgram(program)
+                raise RuntimeError(f'{path} failed to compile:\n{log}')
+            glAttachShader(program, shader)
+            shaders.append(shader)
+
+        # the binary can only be read back if this is set before linking
+        glProgramParameteri(program, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
+        glLinkProgram(program)
+
+        # the shaders are no longer needed once they are linked into the program
+        for shader in shaders:
+            glDetachShader(program, shader)
+            glDeleteShader(shader)
+
+        if not glGetProgramiv(program, GL_LINK_STATUS):
+            log = glGetProgramInfoLog(program).decode()
+            glDeleteProgram(program)
+            raise RuntimeError(f'{", ".join(self.paths)} failed to link:\n{log}')
+        return program
+
+    def use(self):
+        GLState.use_program(self.program)
+
+    def uniform_location(self, name):
+        if name not in self.uniform_locations:
+            self.uniform_locations[name] = glGetUniformLocation(self.program, name)
+        return self.uniform_locations[name]
+
+    @staticmethod
+    def report():
+        return f'{ShaderProgram.loaded_count} loaded from cache, {ShaderProgram.compiled_count} compiled'
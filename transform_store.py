@@ -0,0 +1,387 @@
+import math
+import numpy as np
+
+# quaternions are stored as (x, y, z, w)
+
+# rotation matrices (for column vectors) of any number of quaternions at once
+def quaternions_to_matrices(quaternions):
+    x, y, z, w = np.moveaxis(quaternions, -1, 0)
+    matrices = np.empty(quaternions.shape[:-1] + (3, 3))
+    matrices[..., 0, 0] = 1 - 2 * (y * y + z * z)
+    matrices[..., 0, 1] = 2 * (x * y - z * w)
+    matrices[..., 0, 2] = 2 * (x * z + y * w)
+    matrices[..., 1, 0] = 2 * (x * y + z * w)
+    matrices[..., 1, 1] = 1 - 2 * (x * x + z * z)
+    matrices[..., 1, 2] = 2 * (y * z - x * w)
+    matrices[..., 2, 0] = 2 * (x * z - y * w)
+    matrices[..., 2, 1] = 2 * (y * z + x * w)
+    matrices[..., 2, 2] = 1 - 2 * (x * x + y * y)
+    return matrices
+
+# quaternion of a single rotation matrix (for column vectors)
+def matrix_to_quaternion(matrix):
+    trace = matrix[0, 0] + matrix[1, 1] + matrix[2, 2]
+    if trace > 0:
+        s = 2 * math.sqrt(trace + 1)
+        quaternion = ((matrix[2, 1] - matrix[1, 2]) / s, (matrix[0, 2] - matrix[2, 0]) / s, (matrix[1, 0] - matrix[0, 1]) / s, s / 4)
+    elif matrix[0, 0] > matrix[1, 1] and matrix[0, 0] > matrix[2, 2]:
+        s = 2 * math.sqrt(1 + matrix[0, 0] - matrix[1, 1] - matrix[2, 2])
+        quaternion = (s / 4, (matrix[0, 1] + matrix[1, 0]) / s, (matrix[0, 2] + matrix[2, 0]) / s, (matrix[2, 1] - matrix[1, 2]) / s)
+    elif matrix[1, 1] > matrix[2, 2]:
+        s = 2 * math.sqrt(1 + matrix[1, 1] - matrix[0, 0] - matrix[2, 2])
+        quaternion = ((matrix[0, 1] + matrix[1, 0]) / s, s / 4, (matrix[1, 2] + matrix[2, 1]) / s, (matrix[0, 2] - matrix[2, 0]) / s)
+    else:
+        s = 2 * math.sqrt(1 + matrix[2, 2] - matrix[0, 0] - matrix[1, 1])
+        quaternion = ((matrix[0, 2] + matrix[2, 0]) / s, (matrix[1, 2] + matrix[2, 1]) / s, s / 4, (matrix[1, 0] - matrix[0, 1]) / s)
+    quaternion = np.array(quaternion)
+    return quaternion / np.linalg.norm(quaternion)
+
+class TransformStore:
+    # the store shared by every rendered object
+    instance = None
+
+    @staticmethod
+    def get_instance():
+        if TransformStore.instance is None:
+            TransformStore.instance = TransformStore()
+        return TransformStore.instance
+
+    # keeps the position, rotation and scale of every object in contiguous arrays,
+    #   so all of the model matrices can be rebuilt together instead of one object at a time
+    # the values are kept in double precision and never accumulated into a matrix,
+    #   so repeated transforms do not drift
+    # the one exception is an object rotated after being scaled unevenly, which is sheared and
+    #   cannot be written as a scale and a rotation any more: from then on it keeps the whole
+    #   3x3 part of its model matrix instead (see rotate)
+    # objects can also be parented to one another (see scene_graph.py), in which case
+    #   the world matrix is the object's model matrix followed by its parent's world matrix
+    def __init__(self, capacity=64):
+        self.count = 0
+        self.free_slots = []
+        # incremented whenever any world matrix changes, so other caches can tell
+        #   if anything moved since they were last updated
+        self.version = 0
+        # the slots grouped by their depth in the hierarchy, rebuilt whenever a parent changes
+        self.levels = []
+        self.hierarchy_dirty = True
+        # the simulated transforms of whatever is currently interpolated, as
+        #   (indices, positions, rotations, scales, linears), until they are restored
+        self.interpolated = None
+        self.allocate_arrays(capacity)
+
+    def allocate_arrays(self, capacity):
+        self.capacity = capacity
+        self.positions = np.zeros((capacity, 3))
+        self.rotations = np.zeros((capacity, 4))
+        self.rotations[:, 3] = 1.0
+        self.scales = np.ones((capacity, 3))
+        # the 3x3 part of the model matrix of each object that is sheared, which takes the place
+        #   of its rotation and scale
+        self.linears = np.tile(np.identity(3), (capacity, 1, 1))
+        self.sheared = np.zeros(capacity, dtype=bool)
+        self.model_matrices = np.tile(np.identity(4, dtype='float32'), (capacity, 1, 1))
+        self.world_matrices = np.tile(np.identity(4, dtype='float32'), (capacity, 1, 1))
+        # the inverse transpose of each world matrix's upper 3x3, which transforms normals
+        #   (stored transposed, like the world matrices)
+        self.normal_matrices = np.tile(np.identity(3, dtype='float32'), (capacity, 1, 1))
+        # whether each world matrix only rotates, translates and scales evenly along every axis,
+        #   in which case its normal matrix is just its own 3x3 divided by the squared scale
+        self.uniform_scales = np.ones(capacity, dtype=bool)
+        self.parents = np.full(capacity, -1, dtype='int64')
+        self.dirty = np.zeros(capacity, dtype=bool)
+        # the version in which each world matrix last changed, so a cache over some of the
+        #   objects can find the ones that moved without comparing matrices
+        self.world_versions = np.zeros(capacity, dtype='int64')
+        # the transforms as of the previous simulation step, for drawing in between steps
+        self.previous_positions = self.positions.copy()
+        self.previous_rotations = self.rotations.copy()
+        self.previous_scales = self.scales.copy()
+        self.previous_linears = self.linears.copy()
+
+    def arrays(self):
+        return (self.positions, self.rotations, self.scales, self.linears, self.sheared, self.model_matrices, self.world_matrices,
+                self.normal_matrices, self.uniform_scales, self.parents, self.dirty, self.world_versions,
+                self.previous_positions, self.previous_rotations, self.previous_scales, self.previous_linears)
+
+    # doubles the capacity, keeping every existing transform
+    def grow(self):
+        old_arrays = self.arrays()
+        self.allocate_arrays(self.capacity * 2)
+        for new_array, old_array in zip(self.arrays(), old_arrays):
+            new_array[:len(old_array)] = old_array
+
+    # reserves a slot for a new object, starting at the identity transform
+    def allocate(self):
+        if self.free_slots:
+            index = self.free_slots.pop()
+        else:
+            if self.count == self.capacity:
+                self.grow()
+            index = self.count
+            self.count += 1
+        self.reset(index)
+        return index
+
+    # any children of a freed slot are left at the top of the hierarchy
+    def free(self, index):
+        self.free_slots.append(index)
+        children = self.parents[:self.count] == index
+        self.parents[:self.count][children] = -1
+        self.dirty[:self.count][children] = True
+        self.parents[index] = -1
+        self.hierarchy_dirty = True
+
+    # attaches a slot to a parent slot (or detaches it, with a parent of -1)
+    def set_parent(self, index, parent):
+        ancestor = parent
+        while ancestor != -1:
+            if ancestor == index:
+                raise ValueError('an object cannot be parented to itself or its own descendants')
+            ancestor = self.parents[ancestor]
+        self.parents[index] = parent
+        self.dirty[index] = True
+        self.hierarchy_dirty = True
+
+    # groups the slots by depth, so each level can be updated in one pass once
+    #   every level above it is done
+    def sort_hierarchy(self):
+        parents = self.parents[:self.count]
+        depths = np.zeros(self.count, dtype='int64')
+        has_parent = parents != -1
+        # each pass settles one more level of the hierarchy
+        while True:
+            new_depths = np.where(has_parent, depths[parents] + 1, 0)
+            if np.array_equal(new_depths, depths):
+                break
+            depths = new_depths
+        order = np.argsort(depths, kind='stable')
+        level_starts = np.searchsorted(depths[order], np.arange(depths.max(initial=0) + 2))
+        self.levels = [order[start:end] for start, end in zip(level_starts[:-1], level_starts[1:])]
+        self.hierarchy_dirty = False
+
+    def reset(self, index):
+        self.positions[index] = 0.0
+        self.rotations[index] = (0.0, 0.0, 0.0, 1.0)
+        self.scales[index] = 1.0
+        self.linears[index] = np.identity(3)
+        self.sheared[index] = False
+        # a new object has no previous step to come from
+        self.previous_positions[index] = 0.0
+        self.previous_rotations[index] = (0.0, 0.0, 0.0, 1.0)
+        self.previous_scales[index] = 1.0
+        self.previous_linears[index] = np.identity(3)
+        self.dirty[index] = True
+
+    # each transform is applied in the object's own space, before the transforms it already has,
+    #   which matches multiplying the new matrix on the left of the (row-major) model matrix
+    # these work on one object at a time, so they stick to plain floats
+    #   (numpy's overhead on 3 and 4 element arrays is larger than the math itself)
+    def translate(self, index, offset):
+        if self.sheared[index]:
+            self.positions[index] += np.asarray(offset, dtype='float64') @ self.linears[index]
+            self.dirty[index] = True
+            return
+        sx, sy, sz = self.scales[index].tolist()
+        dx, dy, dz = offset[0] * sx, offset[1] * sy, offset[2] * sz
+        # rotate the scaled offset by the quaternion: v + 2w(q x v) + 2q x (q x v)
+        qx, qy, qz, qw = self.rotations[index].tolist()
+        cx = 2 * (qy * dz - qz * dy)
+        cy = 2 * (qz * dx - qx * dz)
+        cz = 2 * (qx * dy - qy * dx)
+        position = self.positions[index]
+        position[0] += dx + qw * cx + qy * cz - qz * cy
+        position[1] += dy + qw * cy + qz * cx - qx * cz
+        position[2] += dz + qw * cz + qx * cy - qy * cx
+        self.dirty[index] = True
+
+    def scale(self, index, factors):
+        if self.sheared[index]:
+            self.linears[index] *= np.asarray(factors, dtype='float64')[:, np.newaxis]
+        else:
+            self.scales[index] *= factors
+        self.dirty[index] = True
+
+    # a rotation after an uneven scale (one that differs between axes, or flips some of them)
+    #   shears the object, so the object switches over to keeping its whole 3x3 matrix
+    def rotate(self, index, axis, deg):
+        half_angle = math.radians(deg) / 2
+        sin_half = math.sin(half_angle) / math.sqrt(axis[0] * axis[0] + axis[1] * axis[1] + axis[2] * axis[2])
+        bx, by, bz, bw = axis[0] * sin_half, axis[1] * sin_half, axis[2] * sin_half, math.cos(half_angle)
+        sx, sy, sz = self.scales[index].tolist()
+        if self.sheared[index] or not sx == sy == sz:
+            if not self.sheared[index]:
+                self.shear(index)
+            # the rotation's rows, on the left of the rows already there
+            rotation = quaternions_to_matrices(np.array((bx, by, bz, bw))).T
+            self.linears[index] = rotation @ self.linears[index]
+            self.dirty[index] = True
+            return
+        ax, ay, az, aw = self.rotations[index].tolist()
+        x = aw * bx + ax * bw + ay * bz - az * by
+        y = aw * by - ax * bz + ay * bw + az * bx
+        z = aw * bz + ax * by - ay * bx + az * bw
+        w = aw * bw - ax * bx - ay * by - az * bz
+        # renormalizing keeps rounding errors from building up into a scale
+        length = math.sqrt(x * x + y * y + z * z + w * w)
+        self.rotations[index] = (x / length, y / length, z / length, w / length)
+        self.dirty[index] = True
+
+    # switches an object over to keeping its whole 3x3 matrix, starting from its scale and rotation
+    #   (and the same for its previous step, so it is still interpolated from where it was)
+    def shear(self, index):
+        self.linears[index] = self.scales[index][:, np.newaxis] * quaternions_to_matrices(self.rotations[index]).T
+        self.previous_linears[index] = self.previous_scales[index][:, np.newaxis] * quaternions_to_matrices(self.previous_rotations[index]).T
+        self.sheared[index] = True
+
+    # replaces the transform with the position, rotation and scale of a (row-major) model matrix
+    #   a matrix with shear in it is kept whole instead
+    def set_matrix(self, index, matrix):
+        matrix = np.asarray(matrix, dtype='float64')
+        linear = matrix[:3, :3]
+        scales = np.linalg.norm(linear, axis=1)
+        # a reflection is kept as a negative scale
+        if np.linalg.det(linear) < 0:
+            scales[0] = -scales[0]
+        self.positions[index] = matrix[3, :3]
+        self.scales[index] = scales
+        self.rotations[index] = matrix_to_quaternion((linear / scales[:, np.newaxis]).T)
+        self.sheared[index] = False
+        rebuilt = scales[:, np.newaxis] * quaternions_to_matrices(self.rotations[index]).T
+        if not np.allclose(rebuilt, linear, rtol=1e-5, atol=1e-6 * np.abs(linear).max(initial=1.0)):
+            self.shear(index)
+            self.linears[index] = linear
+        self.dirty[index] = True
+
+    # rebuilds the model and world matrices of every object that changed, all at once
+    def update(self):
+        if self.hierarchy_dirty:
+            self.sort_hierarchy()
+
+        dirty = self.dirty[:self.count]
+        indices = np.flatnonzero(dirty)
+        if len(indices) == 0:
+            return
+
+        # the row-major model matrix is scale, then rotation, then translation:
+        #   its upper 3x3 holds the rotation's rows (the transposed matrix) scaled one row at a time
+        rotations = quaternions_to_matrices(self.rotations[indices])
+        model_matrices = self.model_matrices[indices]
+        model_matrices[:, :3, :3] = np.einsum('ni,nji->nij', self.scales[indices], rotations)
+        sheared = indices[self.sheared[indices]]
+        if len(sheared):
+            model_matrices[self.sheared[indices], :3, :3] = self.linears[sheared]
+        model_matrices[:, 3, :3] = self.positions[indices]
+        self.model_matrices[indices] = model_matrices
+
+        # walk down the hierarchy one level at a time, so only the subtrees below
+        #   something that changed are recomputed
+        changed = dirty.copy()
+        for depth, level in enumerate(self.levels):
+            if depth == 0:
+                moved = level[changed[level]]
+                self.world_matrices[moved] = self.model_matrices[moved]
+                self.uniform_scales[moved] = self.even_scales(moved)
+                self.world_versions[moved] = self.version + 1
+            else:
+                changed[level] |= changed[self.parents[level]]
+                moved = level[changed[level]]
+                self.world_matrices[moved] = np.matmul(self.model_matrices[moved], self.world_matrices[self.parents[moved]])
+                # evenly scaled transforms stay that way when combined
+                self.uniform_scales[moved] = self.even_scales(moved) & self.uniform_scales[self.parents[moved]]
+                self.world_versions[moved] = self.version + 1
+
+        self.update_normal_matrices(np.flatnonzero(changed))
+
+        dirty[:] = False
+        self.version += 1
+
+    # whether each object's own scale is the same along every axis (reflections aside)
+    #   sheared objects never are, so they always get an inverted normal matrix
+    def even_scales(self, indices):
+        scales = np.abs(self.scales[indices])
+        smallest = scales.min(axis=1)
+        return (smallest > 0) & (scales.max(axis=1) - smallest <= 1e-9 * smallest) & ~self.sheared[indices]
+
+    # the normal matrices of every object whose world matrix changed, all at once
+    #   evenly scaled transforms take the fast path, and the rest share one batched inverse
+    def update_normal_matrices(self, indices):
+        linear = self.world_matrices[indices, :3, :3].astype('float64')
+        uniform = self.uniform_scales[indices]
+
+        normal_matrices = np.empty_like(linear)
+        # for a rotation scaled by s, the inverse transpose is the same rotation divided by s
+        #   (and s squared is the squared length of any of its rows)
+        even = linear[uniform]
+        normal_matrices[uniform] = even / np.einsum('ni,ni->n', even[:, 0], even[:, 0])[:, np.newaxis, np.newaxis]
+        # the rest are inverted, and transposed to match how the world matrices are stored
+        #   a matrix that cannot be inverted (e.g. scaled down to nothing) keeps its last normal matrix
+        uneven = np.flatnonzero(~uniform)
+        if len(uneven):
+            invertible = np.abs(np.linalg.det(linear[uneven])) > 1e-12
+            normal_matrices[uneven] = self.normal_matrices[indices[uneven]]
+            normal_matrices[uneven[invertible]] = np.swapaxes(np.linalg.inv(linear[uneven[invertible]]), 1, 2)
+        self.normal_matrices[indices] = normal_matrices
+
+    # remembers every transform as it is before a simulation step, to interpolate from afterwards
+    def save_previous(self):
+        self.previous_positions[:self.count] = self.positions[:self.count]
+        self.previous_rotations[:self.count] = self.rotations[:self.count]
+        self.previous_scales[:self.count] = self.scales[:self.count]
+        self.previous_linears[:self.count] = self.linears[:self.count]
+
+    # moves everything that changed in the last simulation step the given fraction of the way
+    #   from where it was before it, so frames drawn between steps still show smooth motion
+    # this replaces the simulated transforms until restore() puts them back
+    #   (and works on the transforms, not the matrices, so rotations stay rotations)
+    def interpolate(self, alpha):
+        count = self.count
+        moved = np.flatnonzero(np.any(self.positions[:count] != self.previous_positions[:count], axis=1)
+                               | np.any(self.rotations[:count] != self.previous_rotations[:count], axis=1)
+                               | np.any(self.scales[:count] != self.previous_scales[:count], axis=1)
+                               | np.any(self.linears[:count] != self.previous_linears[:count], axis=(1, 2)))
+        if len(moved) == 0:
+            return
+        positions, rotations, scales, linears = self.positions[moved], self.rotations[moved], self.scales[moved], self.linears[moved]
+        self.interpolated = (moved, positions, rotations, scales, linears)
+
+        previous_positions = self.previous_positions[moved]
+        previous_rotations = self.previous_rotations[moved]
+        previous_scales = self.previous_scales[moved]
+        self.positions[moved] = previous_positions + alpha * (positions - previous_positions)
+        self.scales[moved] = previous_scales + alpha * (scales - previous_scales)
+        # q and -q are the same rotation, so the one closer to the previous rotation is used
+        #   to go the short way around (steps are small enough that a normalized lerp is as good as a slerp)
+        signs = np.where(np.einsum('ni,ni->n', previous_rotations, rotations) < 0, -1.0, 1.0)[:, np.newaxis]
+        blended = previous_rotations + alpha * (signs * rotations - previous_rotations)
+        self.rotations[moved] = blended / np.linalg.norm(blended, axis=1)[:, np.newaxis]
+        # sheared objects have no rotation to follow, so their matrices are blended directly
+        previous_linears = self.previous_linears[moved]
+        self.linears[moved] = previous_linears + alpha * (linears - previous_linears)
+        self.dirty[moved] = True
+
+    # puts back the simulated transforms after drawing an interpolated frame
+    def restore(self):
+        if self.interpolated is None:
+            return
+        moved, positions, rotations, scales, linears = self.interpolated
+        self.positions[moved] = positions
+        self.rotations[moved] = rotations
+        self.scales[moved] = scales
+        self.linears[moved] = linears
+        self.dirty[moved] = True
+        self.interpolated = None
+
+    def model_matrix(self, index):
+        if self.dirty[index]:
+            self.update()
+        return self.model_matrices[index].copy()
+
+    def world_matrix(self, index):
+        self.update()
+        return self.world_matrices[index].copy()
+
+    # modelview matrices of the given objects (or all of them) in one batched product
+    def modelview_matrices(self, view_matrix, indices=None):
+        self.update()
+        world_matrices = self.world_matrices[:self.count] if indices is None else self.world_matrices[indices]
+        return np.matmul(world_matrices, view_matrix)
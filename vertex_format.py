@@ -0,0 +1,93 @@
+import ctypes
+import numpy as np
+from OpenGL.GL import *
+
+# packs unit vectors into the 32-bit GL_INT_2_10_10_10_REV format, as signed normalized values
+#   x, y and z get 10 bits each (from -511 to 511) and w the last 2, with x in the lowest bits
+def pack_int_2_10_10_10_rev(vectors):
+    vectors = np.asarray(vectors, dtype='float64').reshape(-1, 3)
+    values = np.round(np.clip(vectors, -1.0, 1.0) * 511).astype('int64') & 0x3FF
+    return (values[:, 0] | (values[:, 1] << 10) | (values[:, 2] << 20)).astype('uint32')
+
+class VertexFormat:
+    # how each type of attribute is stored: (numpy type, OpenGL type, normalized)
+    #   float32, float16: floats, at full or half precision
+    #   unorm8: bytes read as values from 0 to 1 (for colors)
+    #   snorm10: a vector packed into 32 bits (see pack_int_2_10_10_10_rev), read as values from -1 to 1 (for normals)
+    types = {
+        'float32': ('float32', GL_FLOAT, False),
+        'float16': ('float16', GL_HALF_FLOAT, False),
+        'unorm8': ('uint8', GL_UNSIGNED_BYTE, True),
+        'snorm10': ('uint32', GL_INT_2_10_10_10_REV, True),
+    }
+
+    # an interleaved vertex layout, where every attribute of a vertex is stored next to the others,
+    #   so a single buffer holds all of the geometry and each vertex is read from one place
+    # attributes are given as (name, location, components, type), named after the Mesh fields they come from
+    #   each one starts on a multiple of 4 bytes, which is the alignment OpenGL expects
+    def __init__(self, attributes):
+        self.attributes = attributes
+        names, formats, offsets = [], [], []
+        offset = 0
+        for name, location, components, attribute_type in attributes:
+            numpy_type = VertexFormat.types[attribute_type][0]
+            field = np.dtype(numpy_type) if attribute_type == 'snorm10' else np.dtype((numpy_type, components))
+            names.append(name)
+            formats.append(field)
+            offsets.append(offset)
+            offset += (field.itemsize + 3) // 4 * 4
+        self.dtype = np.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': offset})
+        self.stride = self.dtype.itemsize
+
+    # interleaves flat per-vertex arrays (e.g. vertices=..., colors=..., normals=...) into this layout
+    #   attributes with more components than their data are padded the way OpenGL would (with 0, and 1 for w)
+    def pack(self, **arrays):
+        vertex_count = len(arrays[self.attributes[0][0]]) // 3
+        packed = np.zeros(vertex_count, dtype=self.dtype)
+        for name, _, components, attribute_type in self.attributes:
+            values = np.asarray(arrays[name], dtype='float32').reshape(vertex_count, -1)
+            if attribute_type == 'snorm10':
+                packed[name] = pack_int_2_10_10_10_rev(values)
+                continue
+            if values.shape[1] < components:
+                padding = np.zeros((vertex_count, components - values.shape[1]), dtype='float32')
+                if components == 4:
+                    padding[:, -1] = 1.0
+                values = np.concatenate((values, padding), axis=1)
+            if attribute_type == 'unorm8':
+                values = np.round(np.clip(values, 0.0, 1.0) * 255)
+            packed[name] = values
+        return packed
+
+    # points the attributes of the bound vertex array at the bound array buffer, starting at offset
+    def set_attributes(self, offset=0):
+        for name, location, components, attribute_type in self.attributes:
+            _, gl_type, normalized = VertexFormat.types[attribute_type]
+            size = 4 if attribute_type == 'snorm10' else components
+            glVertexAttribPointer(location, size, gl_type, GL_TRUE if normalized else GL_FALSE, self.stride,
+                                  ctypes.c_void_p(offset + self.dtype.fields[name][1]))
+            glEnableVertexAttribArray(location)
+
+# every attribute as 32-bit floats (40 bytes a vertex)
+float_format = VertexFormat([
+    ('vertices', 0, 3, 'float32'),
+    ('colors', 1, 4, 'float32'),
+    ('normals', 2, 3, 'float32'),
+])
+
+# byte colors and packed normals (20 bytes a vertex)
+compact_format = VertexFormat([
+    ('vertices', 0, 3, 'float32'),
+    ('colors', 1, 4, 'unorm8'),
+    ('normals', 2, 3, 'snorm10'),
+])
+
+# and half precision positions as well (16 bytes a vertex), for meshes that stay small enough
+#   half floats have 11 bits of precision, so positions far from the origin of their mesh lose detail
+half_format = VertexFormat([
+    ('vertices', 0, 4, 'float16'),
+    ('colors', 1, 4, 'unorm8'),
+    ('normals', 2, 3, 'snorm10'),
+])
+
+formats = {'float': float_format, 'compact': compact_format, 'half': half_format}